@@ -0,0 +1,123 @@
+import math
+
+from collections import OrderedDict
+from time import perf_counter
+
+import numpy as np
+
+from isPrime import isPrimeMillerRabin
+
+# the products of two residues have to fit in an int64
+MAX_MODULUS = math.isqrt(2**63 - 1)
+
+# tables of the last few moduli used, each one grown in place as larger arguments come
+MAX_TABLES = 8
+TABLES: OrderedDict[int, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+
+def factorial_mod_tables(p: int, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    parameters:
+    - p: a prime modulus
+    - size: number of entries, at most p
+
+    num! mod p and its inverse mod p for 0 <= num < size, as two int64 arrays. The tables of p are kept and,
+    when a larger size is asked, extended from their last entry to at least twice their length,
+    so a stream of batches with growing maxima costs one pass over the largest of them.
+    """
+    if p < 2 or p > MAX_MODULUS or not isPrimeMillerRabin(int(p)):
+        raise ValueError(f"The modulus must be a prime between 2 and {MAX_MODULUS}, got {p}.")
+
+    p = int(p)
+    size = min(size, p)
+    fact, invFact = TABLES.pop(p, (np.ones(1, dtype=np.int64), np.ones(1, dtype=np.int64)))
+
+    if size > len(fact):
+        old = len(fact)
+        new = min(max(size, 2*old), p)
+        fact = np.resize(fact, new)
+        invFact = np.resize(invFact, new)
+
+        acc = int(fact[old-1])
+        for num in range(old, new):
+            acc = acc * num % p
+            fact[num] = acc
+
+        # the inverses below old are still valid, only the new ones are filled, down from the top
+        acc = pow(acc, p-2, p)
+        for num in range(new-1, old-1, -1):
+            invFact[num] = acc
+            acc = acc * num % p
+
+    TABLES[p] = (fact, invFact)
+    if len(TABLES) > MAX_TABLES:
+        TABLES.popitem(last=False)
+
+    return fact[:size], invFact[:size]
+
+def factorial_mod(num: int, p: int) -> int:
+
+    if num < 0 or not isinstance(num, int):
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+    if num >= p:
+        return 0
+
+    return int(factorial_mod_tables(p, num+1)[0][num])
+
+def binomial_mod(n_array: np.ndarray, k_array: np.ndarray, p: int) -> np.ndarray:
+    """
+    parameters:
+    - n_array, k_array: integer arrays, broadcast against each other
+    - p: a prime modulus
+
+    C(n, k) mod p elementwise, 0 where k < 0 or k > n. Inputs with n >= p go through Lucas' theorem,
+    one base-p digit per pass over the whole array.
+    """
+    n_array, k_array = np.broadcast_arrays(np.asarray(n_array, dtype=np.int64), np.asarray(k_array, dtype=np.int64))
+
+    if n_array.size and n_array.min() < 0:
+        raise ValueError(f"The binomial coefficient is defined here only for non-negative n.")
+
+    result = ((k_array >= 0) & (k_array <= n_array)).astype(np.int64)
+    if not n_array.size:
+        return result
+
+    fact, invFact = factorial_mod_tables(p, int(n_array.max()) + 1)
+
+    n = np.where(result == 1, n_array, 0)
+    k = np.where(result == 1, k_array, 0)
+    while n.any():
+        ni, ki = n % p, k % p
+        valid = ki <= ni
+        ki = np.where(valid, ki, 0)
+        term = fact[ni] * invFact[ki] % p * invFact[ni - ki] % p
+        result = np.where(valid, result * term % p, 0)
+        n //= p
+        k //= p
+
+    return result
+
+def benchmark(size: int = 10**6, p: int = 10**9 + 7, high: int = 10**4, seed: int = 0) -> None:
+
+    rng = np.random.default_rng(seed)
+    n = rng.integers(0, high, size)
+    k = rng.integers(0, high, size) % (n + 1)
+
+    # built once per p and kept, so the timing below is the per-query cost
+    factorial_mod_tables(p, int(n.max()) + 1)
+    start = perf_counter()
+    vectorized = binomial_mod(n, k, p)
+    print(f"binomial_mod over {size} pairs: {perf_counter() - start:.4f} s")
+
+    sample = min(size, 1000)
+    start = perf_counter()
+    looped = [math.comb(ni, ki) % p for ni, ki in zip(n[:sample].tolist(), k[:sample].tolist())]
+    elapsed = perf_counter() - start
+    print(f"math.comb % p over {sample} pairs: {elapsed:.4f} s, {size * elapsed / sample:.1f} s extrapolated to {size}")
+
+    if vectorized[:sample].tolist() != looped:
+        raise AssertionError("binomial_mod differs from math.comb % p.")
+
+if __name__ == '__main__':
+
+    benchmark()
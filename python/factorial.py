@@ -1,17 +1,34 @@
+import os
+
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
-from typing import Callable
+from time import perf_counter
+from typing import Callable, Iterator
+
+def validateNatural(num: int) -> int:
+    """
+    Returns num unchanged, raising the ValueError of the other variants when it is not a non-negative integer,
+    so the lambda form can check its argument too.
+    """
+    if num < 0 or not isinstance(num, int):
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+    return num
 
-factorialLambda: Callable[[int], int] = lambda num: 1 if num == 0 else num * factorialLambda(num - 1)
+# both recursive forms split the range in halves instead of peeling one factor per call,
+# so the recursion depth is log2(num) and they work far past the interpreter recursion limit
+rangeProductLambda: Callable[[int, int], int] = lambda low, high: 1 if high <= low else high if high - low == 1 else (lambda mid: rangeProductLambda(low, mid) * rangeProductLambda(mid, high))((low + high) // 2)
+
+factorialLambda: Callable[[int], int] = lambda num: rangeProductLambda(0, validateNatural(num))
 
 def factorialRecursive(num: int) -> int:
 
     if num < 0 or not isinstance(num, int):
         raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
 
-    if num == 0:
-        return 1
-
-    return num * factorialRecursive(num-1)
+    return rangeProduct(0, num)
 
 def factorialIterative(num: int) -> int:
 
@@ -31,5 +48,298 @@ def factorialReduce(num: int) -> int:
     if num < 0 or not isinstance(num, int):
         raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
 
-    return reduce(lambda x, y: x * y, range(num+1), 1)
+    return reduce(lambda x, y: x * y, range(1, num+1), 1)
+
+def rangeProduct(low: int, high: int) -> int:
+    """
+    Product of the integers in the half-open interval (low, high], built as a balanced product tree
+    so both operands of every big multiplication have about the same size.
+    """
+    if high - low < 16:
+        prod = 1
+        for i in range(low+1, high+1):
+            prod *= i
+        return prod
+
+    mid = (low + high) // 2
+    return rangeProduct(low, mid) * rangeProduct(mid, high)
+
+def factorialBinarySplit(num: int) -> int:
+
+    if num < 0 or not isinstance(num, int):
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+    return rangeProduct(0, num)
+
+def listProduct(factors: list[int], low: int = 0, high: int | None = None) -> int:
+    """
+    Product of factors[low:high] as a balanced product tree.
+    """
+    if high is None:
+        high = len(factors)
+
+    if high - low < 16:
+        prod = 1
+        for i in range(low, high):
+            prod *= factors[i]
+        return prod
+
+    mid = (low + high) // 2
+    return listProduct(factors, low, mid) * listProduct(factors, mid, high)
+
+def primesUpTo(num: int) -> list[int]:
+    """
+    All the primes p <= num, by the sieve of Eratosthenes.
+    """
+    if num < 2:
+        return []
+
+    sieve = bytearray([1]) * (num + 1)
+    sieve[0] = sieve[1] = 0
+    for i in range(2, int(num**0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytes(len(range(i*i, num+1, i)))
+
+    return [i for i, isPrime in enumerate(sieve) if isPrime]
+
+def legendreExponent(num: int, prime: int) -> int:
+    """
+    Exponent of prime in num!, given by Legendre's formula: sum of floor(num/prime^k) for k >= 1.
+    """
+    exponent = 0
+    while num:
+        num //= prime
+        exponent += num
+
+    return exponent
+
+def factorialPrimeFactorization(num: int) -> int:
+
+    if num < 0 or not isinstance(num, int):
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+    primes = primesUpTo(num)
+    exponents = [legendreExponent(num, prime) for prime in primes[1:]]
+
+    # the odd part is rebuilt bit by bit from the most significant bit of the exponents down:
+    # square what we have so far, then multiply by the primes whose exponent has the current bit set
+    fat = 1
+    for bit in reversed(range(max(exponents, default=0).bit_length())):
+        fat *= fat
+        fat *= listProduct([prime for prime, exponent in zip(primes[1:], exponents) if exponent >> bit & 1])
+
+    # the power of two is just a shift
+    return fat << legendreExponent(num, 2)
+
+PARALLEL_THRESHOLD = 50_000
+
+def rangeProductChunk(bounds: tuple[int, int]) -> int:
+    return rangeProduct(*bounds)
+
+def factorialParallel(num: int, workers: int | None = None, threshold: int = PARALLEL_THRESHOLD) -> int:
+    """
+    parameters:
+    - num: a non-negative integer
+    - workers: number of processes, defaults to os.cpu_count()
+    - threshold: below it the processes startup costs more than it saves, so the sequential product tree is used
+    """
+    if num < 0 or not isinstance(num, int):
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+    workers = workers or os.cpu_count() or 1
+    if num < threshold or workers < 2:
+        return rangeProduct(0, num)
+
+    # a few chunks per worker keeps the pool busy even though the last chunks hold the biggest numbers
+    chunks = 4 * workers
+    bounds = [(num * i // chunks, num * (i+1) // chunks) for i in range(chunks)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        products = list(executor.map(rangeProductChunk, bounds))
+
+    # merge pairwise, as a tree, so the big multiplications stay balanced
+    while len(products) > 1:
+        products = [products[i] * products[i+1] if i+1 < len(products) else products[i] for i in range(0, len(products), 2)]
+
+    return products[0]
+
+ALGORITHMS: dict[str, Callable[[int], int]] = {
+    "lambda": factorialLambda,
+    "recursive": factorialRecursive,
+    "iterative": factorialIterative,
+    "reduce": factorialReduce,
+    "binarySplit": factorialBinarySplit,
+    "primeFactorization": factorialPrimeFactorization,
+    "parallel": factorialParallel,
+}
+
+def factorial(num: int, algorithm: str = "primeFactorization") -> int:
+    """
+    parameters:
+    - num: a non-negative integer
+    - algorithm: one of the keys of ALGORITHMS
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}'. Choose one of: {', '.join(ALGORITHMS)}.")
+
+    return ALGORITHMS[algorithm](num)
+
+class FactorialCache():
+    """
+    Keeps num! for every multiple of step that has been reached, so a call only multiplies
+    from the nearest checkpoint below num. Checkpoints are evicted in LRU order once their
+    total size goes over maxBytes; 0! = 1 is never evicted.
+    """
+
+    def __init__(self, step: int = 64, maxBytes: int = 64 * 2**20) -> None:
+        self.step = step
+        self.maxBytes = maxBytes
+        self.checkpoints: OrderedDict[int, int] = OrderedDict()
+        self.indices: list[int] = [0]
+        self.size = 0
+
+    def nearest(self, num: int) -> tuple[int, int]:
+        base = self.indices[bisect_right(self.indices, num) - 1]
+        if base == 0:
+            return 0, 1
+
+        self.checkpoints.move_to_end(base)
+        return base, self.checkpoints[base]
+
+    def store(self, num: int, fat: int) -> None:
+        if num in self.checkpoints:
+            return
+
+        self.checkpoints[num] = fat
+        insort(self.indices, num)
+        self.size += (fat.bit_length() + 7) // 8
+
+        while self.size > self.maxBytes and self.checkpoints:
+            old, oldFat = self.checkpoints.popitem(last=False)
+            self.indices.remove(old)
+            self.size -= (oldFat.bit_length() + 7) // 8
+
+    def extend(self, base: int, fat: int, num: int) -> int:
+        """
+        Multiplies fat = base! up to num!, storing every checkpoint crossed on the way.
+        """
+        for i in range(base+1, num+1):
+            fat *= i
+            if i % self.step == 0:
+                self.store(i, fat)
+
+        return fat
+
+    def __call__(self, num: int) -> int:
+
+        if num < 0 or not isinstance(num, int):
+            raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+        return self.extend(*self.nearest(num), num)
+
+    def factorials(self, nums: range) -> Iterator[int]:
+        """
+        Yields num! for every num in nums. An ascending range costs one multiplication per integer
+        in it, after the first term.
+        """
+        if nums.step < 0:
+            for num in nums:
+                yield self(num)
+            return
+
+        previous = None
+        for num in nums:
+            fat = self(num) if previous is None else self.extend(previous, fat, num)
+            previous = num
+            yield fat
+
+def benchmarkFactorialCache(sweep: range = range(0, 173), repeats: int = 100) -> None:
+
+    start = perf_counter()
+    for _ in range(repeats):
+        for num in sweep:
+            factorialIterative(num)
+    print(f"factorialIterative over {sweep}, {repeats} times: {perf_counter() - start:.4f} s")
+
+    cache = FactorialCache()
+    start = perf_counter()
+    for _ in range(repeats):
+        for num in sweep:
+            cache(num)
+    print(f"FactorialCache over {sweep}, {repeats} times: {perf_counter() - start:.4f} s")
+
+    start = perf_counter()
+    for _ in range(repeats):
+        for _ in FactorialCache().factorials(sweep):
+            pass
+    print(f"FactorialCache.factorials over {sweep}, {repeats} times: {perf_counter() - start:.4f} s")
+
+def benchmarkFactorials(sizes: tuple[int, ...] = (10**3, 10**4, 10**5, 10**6)) -> None:
+
+    implementations = {
+        "factorialRecursive": factorialRecursive,
+        "factorialIterative": factorialIterative,
+        "factorialReduce": factorialReduce,
+        "factorialBinarySplit": factorialBinarySplit,
+        "factorialPrimeFactorization": factorialPrimeFactorization,
+    }
+
+    for num in sizes:
+        reference = None
+        for name, func in implementations.items():
+            start = perf_counter()
+            fat = func(num)
+            elapsed = perf_counter() - start
+
+            if reference is None:
+                reference = fat
+            elif fat != reference:
+                raise AssertionError(f"{name}({num}) differs from the other implementations.")
+
+            print(f"{name}({num}): {elapsed:.4f} s")
+
+def benchmarkCallOverhead(sizes: tuple[int, ...] = (10, 100, 1000), calls: int = 10_000) -> None:
+
+    implementations = {
+        "factorialLambda": factorialLambda,
+        "factorialRecursive": factorialRecursive,
+        "factorialIterative": factorialIterative,
+    }
+
+    for num in sizes:
+        for name, func in implementations.items():
+            start = perf_counter()
+            for _ in range(calls):
+                func(num)
+            elapsed = perf_counter() - start
+            print(f"{name}({num}): {10**6 * elapsed / calls:.2f} us per call")
+
+    # factorialIterative is left out here, it takes minutes at this size
+    for name, func in (("factorialLambda", factorialLambda), ("factorialRecursive", factorialRecursive)):
+        start = perf_counter()
+        func(10**6)
+        print(f"{name}({10**6}): {perf_counter() - start:.4f} s")
+
+def benchmarkParallelScaling(num: int = 10**6, workerCounts: tuple[int, ...] = (1, 2, 4, 8)) -> None:
+
+    start = perf_counter()
+    reference = factorialBinarySplit(num)
+    sequential = perf_counter() - start
+    print(f"factorialBinarySplit({num}): {sequential:.4f} s")
+
+    for workers in workerCounts:
+        start = perf_counter()
+        fat = factorialParallel(num, workers=workers, threshold=0)
+        elapsed = perf_counter() - start
+
+        if fat != reference:
+            raise AssertionError(f"factorialParallel({num}, workers={workers}) differs from factorialBinarySplit.")
+
+        print(f"factorialParallel({num}, workers={workers}): {elapsed:.4f} s, speedup {sequential/elapsed:.2f}x")
+
+if __name__ == '__main__':
 
+    benchmarkFactorials()
+    benchmarkCallOverhead()
+    benchmarkParallelScaling()
+    benchmarkFactorialCache()
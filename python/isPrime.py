@@ -1,4 +1,16 @@
-from typing import Callable
+import json
+import math
+import os
+
+from bisect import bisect_left
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from time import perf_counter
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
 
 isPrimeLambda: Callable[[int], bool] = lambda num: False if num < 2 or num % 2 == 0 and num > 2 else len(list(filter(lambda denominator: num % denominator == 0, list(range(1, 1+int(num/2)))))) < 2
 
@@ -21,3 +33,703 @@ def isPrimeIterative(num: int) -> bool:
             return False
 
     return True
+
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+# testing against every one of SMALL_PRIMES as witness is deterministic below this bound, which covers all the 64-bit integers
+MILLER_RABIN_BOUND = 318665857834031151167461
+
+def isStrongProbablePrime(num: int, base: int) -> bool:
+    """
+    Miller-Rabin round: num odd, num > base.
+    """
+    d = num - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    x = pow(base, d, num)
+    if x == 1 or x == num - 1:
+        return True
+
+    for _ in range(s - 1):
+        x = x * x % num
+        if x == num - 1:
+            return True
+
+    return False
+
+def jacobi(a: int, n: int) -> int:
+    """
+    Jacobi symbol (a/n) for n odd and positive.
+    """
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+
+    return result if n == 1 else 0
+
+def isStrongLucasProbablePrime(num: int) -> bool:
+    """
+    Strong Lucas test with the parameters of Selfridge's method A: num odd, not a perfect square.
+    """
+    D = 5
+    while True:
+        symbol = jacobi(D, num)
+        if symbol == -1:
+            break
+        if symbol == 0 and abs(D) != num:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+
+    P = 1
+    Q = (1 - D) // 4
+
+    d = num + 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    def half(x: int) -> int:
+        x %= num
+        return (x + num if x % 2 else x) // 2
+
+    # U_k, V_k and Q^k mod num, walking the bits of d from the most significant one
+    U, V, Qk = 1, P, Q % num
+    for bit in bin(d)[3:]:
+        U, V, Qk = U * V % num, (V * V - 2 * Qk) % num, Qk * Qk % num
+        if bit == '1':
+            U, V, Qk = half(P * U + V), half(D * U + P * V), Qk * Q % num
+
+    if U == 0 or V == 0:
+        return True
+
+    for _ in range(s - 1):
+        V, Qk = (V * V - 2 * Qk) % num, Qk * Qk % num
+        if V == 0:
+            return True
+
+    return False
+
+def isPrimeBPSW(num: int) -> bool:
+    """
+    Baillie-PSW: a base 2 Miller-Rabin round plus a strong Lucas test. No composite is known to pass it.
+    """
+    if num < 2 or not isinstance(num, int):
+        raise ValueError(f"A prime number is a positive integer greater than 1 that has exactly two factors: 1 and itself. {num} is not a positive integer.")
+
+    for prime in SMALL_PRIMES:
+        if num % prime == 0:
+            return num == prime
+
+    if not isStrongProbablePrime(num, 2):
+        return False
+
+    if math.isqrt(num)**2 == num:
+        return False
+
+    return isStrongLucasProbablePrime(num)
+
+def isPrimeMillerRabin(num: int) -> bool:
+    """
+    Deterministic Miller-Rabin below MILLER_RABIN_BOUND, Baillie-PSW above it.
+    """
+    if num < 2 or not isinstance(num, int):
+        raise ValueError(f"A prime number is a positive integer greater than 1 that has exactly two factors: 1 and itself. {num} is not a positive integer.")
+
+    for prime in SMALL_PRIMES:
+        if num % prime == 0:
+            return num == prime
+
+    if num >= MILLER_RABIN_BOUND:
+        return isPrimeBPSW(num)
+
+    return all(isStrongProbablePrime(num, base) for base in SMALL_PRIMES)
+
+def benchmarkPrimality(primes: tuple[int, ...] = (999_999_999_989, 1_000_000_000_039, 2**61 - 1, 2**127 - 1)) -> None:
+
+    # isPrimeIterative does about num/2 divisions for a prime, so time it on a small prime and scale linearly
+    small = 10_000_019
+    start = perf_counter()
+    isPrimeIterative(small)
+    perDivision = (perf_counter() - start) / (small / 2)
+
+    for num in primes:
+        for name, func in (("isPrimeMillerRabin", isPrimeMillerRabin), ("isPrimeBPSW", isPrimeBPSW)):
+            start = perf_counter()
+            result = func(num)
+            print(f"{name}({num}) = {result}: {10**6 * (perf_counter() - start):.1f} us")
+        print(f"isPrimeIterative({num}): about {perDivision * num / 2:.3g} s, extrapolated")
+
+# odd numbers per segment, a 1 MiB bool array, so a segment stays in the cache while it is sieved.
+# The segments are sieved one byte per odd number and packed to bits only where they are stored, in PrimeIndex:
+# crossing out bits in a packed segment takes 8 strided writes per prime instead of one, and measured
+# slower, 4.0 s against 3.2 s to count the primes below 10^9 even with segments 8 times as long
+SEGMENT_SIZE = 2**20
+
+def basePrimes(limit: int) -> list[int]:
+    """
+    The odd primes p <= limit, used to cross out the composites of the segments.
+    """
+    if limit < 3:
+        return []
+
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for i in range(2, math.isqrt(limit) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = False
+
+    return np.flatnonzero(sieve)[1:].tolist()
+
+def sieveOddSegment(start: int, count: int, primes: list[int]) -> np.ndarray:
+    """
+    parameters:
+    - start: an odd number
+    - count: the segment holds the odd numbers start, start+2, ..., start+2*(count-1)
+    - primes: the odd primes up to the square root of the segment end
+    """
+    segment = np.ones(count, dtype=bool)
+    end = start + 2*count
+
+    for prime in primes:
+        square = prime * prime
+        if square >= end:
+            break
+
+        multiple = max(square, (start + prime - 1) // prime * prime)
+        if multiple % 2 == 0:
+            multiple += prime
+        segment[(multiple - start) // 2::prime] = False
+
+    if start == 1:
+        segment[0] = False
+
+    return segment
+
+def sieveSegments(lo: int, hi: int) -> Iterator[np.ndarray]:
+    """
+    Yields the primes in [lo, hi) one segment at a time, so the memory stays bounded by SEGMENT_SIZE
+    whatever the size of the range.
+    """
+    if hi <= max(lo, 2):
+        return
+
+    primes = basePrimes(math.isqrt(hi - 1))
+
+    if lo <= 2:
+        yield np.array([2], dtype=np.int64)
+
+    start = max(lo, 1) | 1
+    while start < hi:
+        count = min(SEGMENT_SIZE, (hi - start + 1) // 2)
+        segment = sieveOddSegment(start, count, primes)
+        yield start + 2*np.flatnonzero(segment)
+        start += 2*count
+
+def sieveRange(lo: int, hi: int) -> np.ndarray:
+    """
+    All the primes in [lo, hi) as an int64 array.
+    """
+    return np.concatenate([np.empty(0, dtype=np.int64), *sieveSegments(lo, hi)])
+
+# odd numbers handed to a worker at once, several segments so the inter-process traffic stays small
+TASK_SIZE = 16 * SEGMENT_SIZE
+
+WORKER_PRIMES: list[int] = []
+
+def initSieveWorker(primes: list[int]) -> None:
+    global WORKER_PRIMES
+    WORKER_PRIMES = primes
+
+def sieveTask(task: tuple[int, int, bool]) -> np.ndarray | int:
+    """
+    parameters:
+    - task: (start, count, countOnly), the odd numbers start, start+2, ..., start+2*(count-1)
+      and whether to return only how many primes there are instead of the primes themselves
+    """
+    start, count, countOnly = task
+    total = 0
+    chunks = []
+    for first in range(0, count, SEGMENT_SIZE):
+        segment = sieveOddSegment(start + 2*first, min(SEGMENT_SIZE, count - first), WORKER_PRIMES)
+        if countOnly:
+            total += int(np.count_nonzero(segment))
+        else:
+            chunks.append(start + 2*first + 2*np.flatnonzero(segment))
+
+    return total if countOnly else np.concatenate(chunks)
+
+def parallelSieve(lo: int, hi: int, workers: int | None, countOnly: bool) -> Iterator[np.ndarray | int]:
+    """
+    Results of sieveTask over [lo, hi), in order. The base primes are sent once to each worker,
+    and at most 2 tasks per worker are in flight so a slow consumer does not pile up results.
+    """
+    if hi <= max(lo, 2):
+        return
+
+    primes = basePrimes(math.isqrt(hi - 1))
+
+    if lo <= 2:
+        yield 1 if countOnly else np.array([2], dtype=np.int64)
+
+    tasks = []
+    start = max(lo, 1) | 1
+    while start < hi:
+        count = min(TASK_SIZE, (hi - start + 1) // 2)
+        tasks.append((start, count, countOnly))
+        start += 2*count
+
+    workers = workers or os.cpu_count() or 1
+    if workers < 2:
+        initSieveWorker(primes)
+        yield from map(sieveTask, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initSieveWorker, initargs=(primes,)) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(sieveTask, task))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+def count_primes(lo: int, hi: int, workers: int | None = None) -> int:
+    """
+    Number of primes in [lo, hi), sieved across a process pool of workers processes.
+    """
+    return sum(parallelSieve(lo, hi, workers, countOnly=True))
+
+def primes_in_range(lo: int, hi: int, workers: int | None = None) -> Iterator[np.ndarray]:
+    """
+    Yields the primes in [lo, hi) in ascending order, one int64 array per task, sieved across a process pool.
+    """
+    yield from parallelSieve(lo, hi, workers, countOnly=False)
+
+class PrimeIndex():
+    """
+    Bit-packed table of the odd numbers below bound, bit i set when 2*i+1 is prime.
+    Built once, segment by segment, then every is_prime(num) with num < bound is a single lookup.
+    """
+
+    def __init__(self, bound: int, bits: np.ndarray | None = None) -> None:
+        self.bound = bound
+
+        if bits is not None:
+            self.bits = bits
+            return
+
+        count = bound // 2
+        self.bits = np.zeros((count + 7) // 8, dtype=np.uint8)
+        primes = basePrimes(math.isqrt(bound))
+
+        # SEGMENT_SIZE is a multiple of 8, so every segment packs into whole bytes
+        for first in range(0, count, SEGMENT_SIZE):
+            segment = sieveOddSegment(2*first + 1, min(SEGMENT_SIZE, count - first), primes)
+            packed = np.packbits(segment)
+            self.bits[first // 8:first // 8 + len(packed)] = packed
+
+    def is_prime(self, num: int) -> bool:
+
+        if num >= self.bound:
+            raise ValueError(f"{num} is beyond the sieved bound {self.bound}.")
+
+        if num < 3:
+            return num == 2
+
+        if num % 2 == 0:
+            return False
+
+        i = num // 2
+        return bool(self.bits[i >> 3] >> (7 - (i & 7)) & 1)
+
+    def save(self, path: str) -> None:
+        np.savez(path, bound=self.bound, bits=self.bits)
+
+    @classmethod
+    def load(cls, path: str) -> 'PrimeIndex':
+        with np.load(path) as data:
+            return cls(int(data['bound']), data['bits'])
+
+SMALL_TABLE_LIMIT = 2**16
+SMALL_TABLE = np.zeros(SMALL_TABLE_LIMIT, dtype=bool)
+SMALL_TABLE[sieveRange(0, SMALL_TABLE_LIMIT)] = True
+
+# odd primes used for the vectorized trial division
+TRIAL_PRIMES = sieveRange(3, 256).tolist()
+
+# these bases make Miller-Rabin deterministic below 4759123141 > 2**32
+MILLER_RABIN_32_BITS_BASES = (2, 7, 61)
+
+def powModVectorized(base: int, exponents: np.ndarray, moduli: np.ndarray) -> np.ndarray:
+    """
+    base**exponents % moduli elementwise, for moduli < 2**32 so the products fit in an uint64.
+    """
+    result = np.ones_like(moduli)
+    power = np.uint64(base) % moduli
+    exponents = exponents.copy()
+    while exponents.any():
+        odd = (exponents & np.uint64(1)).astype(bool)
+        result = np.where(odd, result * power % moduli, result)
+        power = power * power % moduli
+        exponents >>= np.uint64(1)
+
+    return result
+
+def millerRabinVectorized(nums: np.ndarray) -> np.ndarray:
+    """
+    Deterministic Miller-Rabin over an uint64 array of odd numbers in (61, 2**32).
+    """
+    d = nums - np.uint64(1)
+    s = np.zeros(nums.shape, dtype=np.int64)
+    even = d % np.uint64(2) == 0
+    while even.any():
+        d[even] >>= np.uint64(1)
+        s[even] += 1
+        even = d % np.uint64(2) == 0
+
+    minusOne = nums - np.uint64(1)
+    result = np.ones(nums.shape, dtype=bool)
+    for base in MILLER_RABIN_32_BITS_BASES:
+        x = powModVectorized(base, d, nums)
+        passed = (x == 1) | (x == minusOne)
+        for r in range(1, int(s.max(initial=0))):
+            x = x * x % nums
+            passed |= (x == minusOne) & (r < s)
+        result &= passed
+
+    return result
+
+def is_prime_batch(nums: np.ndarray) -> np.ndarray:
+    """
+    Primality of every element of an int64 array, as a bool array of the same shape.
+    Values below SMALL_TABLE_LIMIT are looked up, the rest go through trial division by TRIAL_PRIMES
+    over the whole array and only the survivors reach Miller-Rabin: vectorized below 2**32,
+    isPrimeMillerRabin one by one above it.
+    """
+    nums = np.asarray(nums, dtype=np.int64)
+    result = np.zeros(nums.shape, dtype=bool)
+    flat = nums.ravel()
+    out = result.ravel()
+
+    small = (flat >= 0) & (flat < SMALL_TABLE_LIMIT)
+    out[small] = SMALL_TABLE[flat[small]]
+
+    indices = np.flatnonzero((flat >= SMALL_TABLE_LIMIT) & (flat % 2 == 1))
+    candidates = flat[indices]
+    for prime in TRIAL_PRIMES:
+        survivors = candidates % prime != 0
+        indices, candidates = indices[survivors], candidates[survivors]
+
+    below = candidates < 2**32
+    out[indices[below]] = millerRabinVectorized(candidates[below].astype(np.uint64))
+    out[indices[~below]] = [isPrimeMillerRabin(num) for num in candidates[~below].tolist()]
+
+    return result
+
+def benchmarkBatch(size: int = 10**6, seed: int = 0) -> None:
+
+    rng = np.random.default_rng(seed)
+    for high in (2**31, 2**62):
+        nums = rng.integers(0, high, size)
+
+        start = perf_counter()
+        batch = is_prime_batch(nums)
+        elapsed = perf_counter() - start
+        print(f"is_prime_batch below {high}: {size / elapsed:.3g} candidates/s")
+
+        sample = nums[:size // 10].tolist()
+        start = perf_counter()
+        looped = [num >= 2 and isPrimeMillerRabin(num) for num in sample]
+        elapsed = perf_counter() - start
+        print(f"isPrimeMillerRabin loop below {high}: {len(sample) / elapsed:.3g} candidates/s")
+
+        if batch[:len(sample)].tolist() != looped:
+            raise AssertionError("is_prime_batch differs from isPrimeMillerRabin.")
+
+# gaps between the integers coprime to 2*3*5, starting from 7
+WHEEL_GAPS = (4, 2, 4, 2, 4, 6, 2, 6)
+
+TRIAL_DIVISION_BOUND = 10**4
+
+def pollardRhoBrent(num: int, c: int = 1) -> int:
+    """
+    A non-trivial factor of the odd composite num, by Pollard's rho with Brent's cycle detection.
+    The gcd is taken once per batch of BATCH steps; c is changed whenever a batch overshoots to num.
+    """
+    BATCH = 128
+    while True:
+        y, r, q, g = 2, 1, 1, 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y*y + c) % num
+
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(BATCH, r - k)):
+                    y = (y*y + c) % num
+                    q = q * abs(x - y) % num
+                g = math.gcd(q, num)
+                k += BATCH
+            r *= 2
+
+        if g == num:
+            # backtrack one step at a time inside the last batch
+            g = 1
+            while g == 1:
+                ys = (ys*ys + c) % num
+                g = math.gcd(abs(x - ys), num)
+
+        if g != num:
+            return g
+
+        c += 1
+
+def factorize(num: int) -> dict[int, int]:
+    """
+    Prime factorization of num as {prime: exponent}, in ascending order of the primes.
+    Trial division by a 2*3*5 wheel up to TRIAL_DIVISION_BOUND, then Pollard-Rho-Brent on what is left,
+    splitting until isPrimeMillerRabin accepts every factor.
+    """
+    if num < 1 or not isinstance(num, int):
+        raise ValueError(f"Only the positive integers have a prime factorization, {num} is not a positive integer.")
+
+    factors = Counter()
+
+    for prime in (2, 3, 5):
+        while num % prime == 0:
+            factors[prime] += 1
+            num //= prime
+
+    divisor, gap = 7, 0
+    while divisor <= TRIAL_DIVISION_BOUND and divisor * divisor <= num:
+        while num % divisor == 0:
+            factors[divisor] += 1
+            num //= divisor
+        divisor += WHEEL_GAPS[gap]
+        gap = (gap + 1) % len(WHEEL_GAPS)
+
+    composites = [num] if num > 1 else []
+    while composites:
+        composite = composites.pop()
+        if composite < divisor * divisor or isPrimeMillerRabin(composite):
+            factors[composite] += 1
+            continue
+
+        factor = pollardRhoBrent(composite)
+        composites += [factor, composite // factor]
+
+    return dict(sorted(factors.items()))
+
+@lru_cache(maxsize=2**16)
+def factorizeCached(num: int) -> tuple[tuple[int, int], ...]:
+    return tuple(factorize(num).items())
+
+def factorize_batch(nums: Iterable[int]) -> list[dict[int, int]]:
+    """
+    factorize over many numbers, repeated ones answered from an LRU cache of the last 2**16 distinct inputs.
+    """
+    return [dict(factorizeCached(int(num))) for num in nums]
+
+def benchmarkFactorize(seed: int = 0) -> None:
+
+    for num in (600851475143, 1_000_003 * 1_000_033, 1_000_000_007 * 1_000_000_009, 2**64 + 1, 2**101 - 1):
+        start = perf_counter()
+        factors = factorize(num)
+        print(f"factorize({num}) = {factors}: {1000 * (perf_counter() - start):.2f} ms")
+
+    rng = np.random.default_rng(seed)
+    nums = rng.integers(2, 10**12, 1000).repeat(20).tolist()
+
+    start = perf_counter()
+    for num in nums:
+        factorize(num)
+    print(f"factorize over {len(nums)} inputs: {perf_counter() - start:.2f} s")
+
+    factorizeCached.cache_clear()
+    start = perf_counter()
+    factorize_batch(nums)
+    print(f"factorize_batch over {len(nums)} inputs: {perf_counter() - start:.2f} s")
+
+WHEEL_MODULUS = 2*3*5*7
+
+# the numbers coprime to WHEEL_MODULUS in one turn of the wheel, starting from 11, and the gaps between them
+WHEEL_RESIDUES = [r for r in range(11, 11 + WHEEL_MODULUS) if math.gcd(r, WHEEL_MODULUS) == 1]
+WHEEL_210_GAPS = [b - a for a, b in zip(WHEEL_RESIDUES, WHEEL_RESIDUES[1:] + [WHEEL_RESIDUES[0] + WHEEL_MODULUS])]
+
+def wheelCeil(num: int) -> tuple[int, int]:
+    """
+    The smallest number >= max(num, 11) coprime to WHEEL_MODULUS, and its position in WHEEL_RESIDUES.
+    """
+    turn, residue = divmod(max(num, 11) - 11, WHEEL_MODULUS)
+    index = bisect_left(WHEEL_RESIDUES, residue + 11)
+    if index == len(WHEEL_RESIDUES):
+        turn, index = turn + 1, 0
+
+    return WHEEL_MODULUS*turn + WHEEL_RESIDUES[index], index
+
+class PrimeStream():
+    """
+    Unbounded iterator over the primes >= start, by an incremental sieve on the 2*3*5*7 wheel.
+    composites maps the next pending multiple of every base prime p to (p, wheel position of its cofactor),
+    and p only enters it once the candidates reach p*p, so it holds pi(sqrt(n)) entries. The base primes
+    come from a nested PrimeStream, created when the first one is needed.
+    """
+
+    def __init__(self, start: int = 2) -> None:
+        self.small = [prime for prime in (2, 3, 5, 7) if prime >= start]
+        self.candidate, self.index = wheelCeil(start)
+        self.composites: dict[int, tuple[int, int]] = {}
+        self.base: PrimeStream | None = None
+        self.basePrime = 11
+
+        # when starting past 121 the multiples of the base primes already passed start from the first one >= start
+        while self.basePrime**2 < self.candidate:
+            cofactor, index = wheelCeil(-(-self.candidate // self.basePrime))
+            self.add_multiple(self.basePrime * cofactor, self.basePrime, index)
+            self.basePrime = self.next_base_prime()
+
+    def next_base_prime(self) -> int:
+        if self.base is None:
+            self.base = PrimeStream(self.basePrime + 1)
+
+        return next(self.base)
+
+    def add_multiple(self, multiple: int, prime: int, index: int) -> None:
+        while multiple in self.composites:
+            multiple += prime * WHEEL_210_GAPS[index]
+            index = (index + 1) % len(WHEEL_210_GAPS)
+
+        self.composites[multiple] = (prime, index)
+
+    def __iter__(self) -> 'PrimeStream':
+        return self
+
+    def __next__(self) -> int:
+
+        if self.small:
+            return self.small.pop(0)
+
+        while True:
+            candidate, index = self.candidate, self.index
+            self.candidate += WHEEL_210_GAPS[index]
+            self.index = (index + 1) % len(WHEEL_210_GAPS)
+
+            if candidate in self.composites:
+                prime, index = self.composites.pop(candidate)
+                self.add_multiple(candidate + prime * WHEEL_210_GAPS[index], prime, (index + 1) % len(WHEEL_210_GAPS))
+            elif candidate < self.basePrime**2:
+                return candidate
+            else:
+                prime = self.basePrime
+                _, index = wheelCeil(prime)
+                self.add_multiple(candidate + prime * WHEEL_210_GAPS[index], prime, (index + 1) % len(WHEEL_210_GAPS))
+                self.basePrime = self.next_base_prime()
+
+    def state(self) -> dict:
+        """
+        A JSON-serializable checkpoint, from_state resumes the stream right where it was.
+        """
+        return {
+            "small": list(self.small),
+            "candidate": self.candidate,
+            "index": self.index,
+            "composites": [[multiple, prime, index] for multiple, (prime, index) in self.composites.items()],
+            "basePrime": self.basePrime,
+            "base": self.base.state() if self.base is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'PrimeStream':
+        stream = cls.__new__(cls)
+        stream.small = list(state["small"])
+        stream.candidate = state["candidate"]
+        stream.index = state["index"]
+        stream.composites = {multiple: (prime, index) for multiple, prime, index in state["composites"]}
+        stream.basePrime = state["basePrime"]
+        stream.base = cls.from_state(state["base"]) if state["base"] is not None else None
+        return stream
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.state(), file)
+
+    @classmethod
+    def load(cls, path: str) -> 'PrimeStream':
+        with open(path) as file:
+            return cls.from_state(json.load(file))
+
+def nextPrimes(num: int, k: int) -> list[int]:
+    """
+    The k smallest primes greater than num.
+    """
+    return list(islice(PrimeStream(num + 1), k))
+
+def benchmarkPrimeStream(count: int = 10**6) -> None:
+
+    stream = PrimeStream()
+    start = perf_counter()
+    last = 0
+    for last in islice(stream, count):
+        pass
+    print(f"PrimeStream, first {count} primes up to {last}: {perf_counter() - start:.2f} s, {len(stream.composites)} pending multiples")
+
+    for num in (10**9, 10**12):
+        start = perf_counter()
+        primes = nextPrimes(num, 10)
+        print(f"nextPrimes({num}, 10) = {primes}: {perf_counter() - start:.2f} s")
+
+def benchmarkParallelSieve(bounds: tuple[int, ...] = (10**9, 10**10, 10**11), workerCounts: tuple[int, ...] = (1, 2, 4, 8)) -> None:
+
+    for bound in bounds:
+        sequential = None
+        for workers in workerCounts:
+            start = perf_counter()
+            count = count_primes(0, bound, workers=workers)
+            elapsed = perf_counter() - start
+
+            if sequential is None:
+                sequential, reference = elapsed, count
+            elif count != reference:
+                raise AssertionError(f"count_primes(0, {bound}, workers={workers}) differs from the run with {workerCounts[0]} workers.")
+
+            print(f"count_primes(0, {bound}, workers={workers}) = {count}: {elapsed:.2f} s, speedup {sequential / elapsed:.2f}x")
+
+def benchmarkSieve(bounds: tuple[int, ...] = (10**8, 10**9, 10**10)) -> None:
+
+    for bound in bounds:
+        start = perf_counter()
+        count = sum(len(segment) for segment in sieveSegments(0, bound))
+        print(f"primes below {bound}: {count}, {perf_counter() - start:.2f} s")
+
+    start = perf_counter()
+    index = PrimeIndex(10**8)
+    print(f"PrimeIndex(10**8): {perf_counter() - start:.2f} s, {index.bits.nbytes / 2**20:.1f} MiB")
+
+    start = perf_counter()
+    for num in range(10**8 - 10**5, 10**8):
+        index.is_prime(num)
+    print(f"PrimeIndex.is_prime: {10**6 * (perf_counter() - start) / 10**5:.2f} us per query")
+
+if __name__ == '__main__':
+
+    benchmarkPrimality()
+    benchmarkSieve()
+    benchmarkBatch()
+    benchmarkParallelSieve()
+    benchmarkFactorize()
+    benchmarkPrimeStream()
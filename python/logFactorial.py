@@ -0,0 +1,60 @@
+import math
+
+from time import perf_counter
+
+import numpy as np
+
+SMALL = 256
+
+# log(num!) for num < SMALL, rounded once from the exact integer factorial
+LOG_FACTORIAL_TABLE = np.array([math.log(math.factorial(num)) for num in range(SMALL)])
+
+def log_factorial(nums: np.ndarray) -> np.ndarray:
+    """
+    parameters:
+    - nums: array of non-negative integers
+
+    log(num!) elementwise. Values below SMALL are looked up in LOG_FACTORIAL_TABLE, the rest use
+    the Stirling series for lgamma(num+1), which at num >= SMALL is accurate to the float64 precision.
+    """
+    nums = np.asarray(nums)
+
+    if not np.issubdtype(nums.dtype, np.integer):
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Got an array of {nums.dtype}.")
+
+    if nums.size and nums.min() < 0:
+        raise ValueError(f"The factorial is a function defined only for the natural numbers, that is, the non-negative integers. Look for Gamma function if you want a extension to the Complexes numbers.")
+
+    out = np.empty(nums.shape, dtype=np.float64)
+
+    small = nums < SMALL
+    out[small] = LOG_FACTORIAL_TABLE[nums[small]]
+
+    large = ~small
+    x = nums[large].astype(np.float64)
+    inv = 1/x
+    inv2 = inv*inv
+    out[large] = x*np.log(x) - x + 0.5*np.log(2*np.pi*x) + inv*(1/12 - inv2*(1/360 - inv2*(1/1260 - inv2/1680)))
+
+    return out
+
+def benchmark(size: int = 10**7, high: int = 10**6, seed: int = 0) -> None:
+
+    nums = np.random.default_rng(seed).integers(0, high, size)
+
+    start = perf_counter()
+    vectorized = log_factorial(nums)
+    elapsed = perf_counter() - start
+    print(f"log_factorial over {size} elements: {elapsed:.4f} s")
+
+    start = perf_counter()
+    looped = np.array([math.lgamma(num + 1) for num in nums.tolist()])
+    elapsed = perf_counter() - start
+    print(f"math.lgamma loop over {size} elements: {elapsed:.4f} s")
+
+    error = np.abs(vectorized - looped) / np.maximum(np.abs(looped), 1)
+    print(f"max relative error against math.lgamma: {error.max():.2e}")
+
+if __name__ == '__main__':
+
+    benchmark()
@@ -1,8 +1,25 @@
+import argparse
+import csv
+import glob
+import hashlib
+import inspect
+import io
+import json
 import lmfit
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import re
+import tempfile
+import warnings
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from matplotlib.figure import Figure
+from scipy.optimize import least_squares, leastsq
+from scipy.sparse import coo_matrix, diags
+from time import perf_counter, sleep
+from typing import Iterable, Iterator
 
 def thermal_lens_light_intensity_shen_model_def(t: float, tc: float, m: float, V: float, th: float) -> float:
     """
@@ -15,6 +32,26 @@ def thermal_lens_light_intensity_shen_model_def(t: float, tc: float, m: float, V
     """
     return abs(1-(th/2)*np.arctan((2*m*V*2*t)/(tc*((1+2*m)**2+V**2)+2*t*(1+2*m+V**2))))**2
 
+def thermal_lens_light_intensity_shen_model_jacobian(t: float, tc: float, m: float, V: float, th: float) -> dict[str, float]:
+    """
+    parameters: the same of thermal_lens_light_intensity_shen_model_def
+
+    returns the partial derivatives of the model with respect to tc, m, V and th.
+    Writing the model as u**2, with u = 1 - (th/2)*arctan(A/B), A = 4*m*V*t and B = tc*((1+2*m)**2+V**2) + 2*t*(1+2*m+V**2)
+    """
+    A = 4*m*V*t
+    B = tc*((1+2*m)**2+V**2) + 2*t*(1+2*m+V**2)
+    z = A/B
+    u = 1-(th/2)*np.arctan(z)
+    dI_dz = -u*th/(1+z**2)
+
+    return {
+        "tc": dI_dz*(-z/B)*((1+2*m)**2+V**2),
+        "m": dI_dz*(4*V*t - z*(4*tc*(1+2*m) + 4*t))/B,
+        "V": dI_dz*(4*m*t - z*(2*V*tc + 4*V*t))/B,
+        "th": -u*np.arctan(z),
+    }
+
 def tc_def(re0: float, D: float) -> float:
     """
     parameters:
@@ -79,52 +116,1208 @@ def thermal_lens_light_intensity_shen_model(t: float, tc: float, z1: float, z2:
     - lp: wavelength of the probe beam
     - th: theta
     """
-    return thermal_lens_light_intensity_shen_model_def(t, tc, m_def(gaussian_laser_beam_profile_def(z1, 0, zc_def(rp0, lp), rp0), re0), V_def(z1, z2, zc_def(rp0, lp)), th)
+    optics = (z1, z2, re0, rp0, lp)
+
+    # arrays can not be hashed, the geometry is then computed directly instead of cached
+    if any(isinstance(arg, np.ndarray) for arg in optics):
+        return thermal_lens_light_intensity_shen_model_def(t, tc, *shen_geometry.__wrapped__(*optics), th)
+
+    return thermal_lens_light_intensity_shen_model_def(t, tc, *shen_geometry(*optics), th)
+
+@lru_cache(maxsize=128)
+def shen_geometry(z1: float, z2: float, re0: float, rp0: float, lp: float) -> tuple[float, float]:
+    """
+    parameters:
+    - z1: distance between pump-probe focii
+    - z2: distance to the sensor from the sampel
+    - re0: pump beam radius at the focii
+    - rp0: probe beam radius at the focii
+    - lp: wavelength of the probe beam
+
+    returns (m, V), computed once per optical setup
+    """
+    zcp = zc_def(rp0, lp)
+    return m_def(gaussian_laser_beam_profile_def(z1, 0, zcp, rp0), re0), V_def(z1, z2, zcp)
+
+class ShenModel():
+    """
+    The Shen model with the geometry (m, V) fixed, so only the time dependent part is left to evaluate:
+    I(t) = (1 - (th/2)*arctan(a*t/(b*tc + c*t)))**2, with a, b, c computed once from m and V.
+    Instances are callables of (t, tc, th) and can be given to fitter as model_func.
+    """
+
+    __name__ = 'shen_model'
+
+    def __init__(self, z1: float, z2: float, re0: float, rp0: float, lp: float) -> None:
+        self.setup(*shen_geometry(z1, z2, re0, rp0, lp))
 
+    @classmethod
+    def from_geometry(cls, m: float, V: float) -> 'ShenModel':
+        model = cls.__new__(cls)
+        model.setup(m, V)
+        return model
 
-def fitter(model_func: callable, params_to_fit: dict[str, dict[float, bool]], path_to_data: str, xname: str, yname: str = 'y_label'):
+    def setup(self, m: float, V: float) -> None:
+        self.m = m
+        self.V = V
+        self.a = 4*m*V
+        self.b = (1+2*m)**2 + V**2
+        self.c = 2*(1+2*m+V**2)
+
+    def __call__(self, t: np.ndarray, tc: float, th: float) -> np.ndarray:
+        return (1 - (th/2)*np.arctan(self.a*t/(self.b*tc + self.c*t)))**2
+
+    def jacobian(self, t: np.ndarray, tc: float, th: float) -> dict[str, np.ndarray]:
+        z = self.a*t/(self.b*tc + self.c*t)
+        u = 1 - (th/2)*np.arctan(z)
+        return {
+            "tc": u*th*z*self.b/((1+z**2)*(self.b*tc + self.c*t)),
+            "th": -u*np.arctan(z),
+        }
+
+def make_dfun(jacobian: callable, xname: str) -> callable:
+    """
+    Wraps a jacobian returning {param: partial derivative} as the Dfun lmfit passes to leastsq,
+    with one row per varying parameter (col_deriv=True) of the residual (data - model)*weights.
+    """
+    def dfun(params: lmfit.Parameters, data: np.ndarray, weights: np.ndarray | None, **kwargs) -> np.ndarray:
+        values = {name: par.value for name, par in params.items() if name != xname}
+        partials = jacobian(kwargs[xname], **values)
+        rows = -np.array([partials[name] for name, par in params.items() if par.vary])
+        return rows if weights is None else rows*weights
+
+    return dfun
+
+def model_jacobian(model_func: callable) -> callable:
+    """
+    The analytic jacobian of model_func when there is one: the Shen jacobian for the Shen model function,
+    the jacobian method of a model object like ShenModel, None otherwise so the fit falls back to finite differences.
+    """
+    if model_func is thermal_lens_light_intensity_shen_model_def:
+        return thermal_lens_light_intensity_shen_model_jacobian
+
+    return getattr(model_func, 'jacobian', None)
+
+def load_data(path_to_data: str, cache: bool = True) -> np.ndarray:
+    """
+    parameters:
+    - path_to_data: a text file of columns, or a .npy/.npz holding the same 2D array
+    - cache: keep the parsed text as a .npy sidecar next to it
+
+    .npy files are memory mapped. Text files are parsed once and saved to a sidecar named after their
+    size and modification time, so an edited file gets parsed again and the next runs just memory map the sidecar.
+    """
+    extension = os.path.splitext(path_to_data)[1].lower()
+    if extension == '.npy':
+        return np.load(path_to_data, mmap_mode='r')
+
+    if extension == '.npz':
+        with np.load(path_to_data) as archive:
+            return archive[archive.files[0]]
+
+    stat = os.stat(path_to_data)
+    sidecar = f"{path_to_data}.{stat.st_size}-{stat.st_mtime_ns}.npy"
+    if cache and os.path.exists(sidecar):
+        return np.load(sidecar, mmap_mode='r')
 
     data = np.loadtxt(path_to_data)
-    x_data = data[:,0]
-    y_data = data[:,1]
 
+    if cache:
+        try:
+            for stale in glob.glob(glob.escape(path_to_data) + '.*-*.npy'):
+                os.remove(stale)
+
+            # written under a temporary name first, so a concurrent reader never maps a partial file
+            temporary = f"{sidecar}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as file:
+                np.save(file, data)
+            os.replace(temporary, sidecar)
+        except OSError:
+            pass
+
+    return data
+
+def log_decimate(x_data: np.ndarray, y_data: np.ndarray, bins: int = 200) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    parameters:
+    - x_data, y_data: the full data, x sorted and oversampled where the curve is flat
+    - bins: number of log-spaced bins between the first positive x and the last one
+
+    returns the bin averages of x and y and the weights 1/stderr of each average, sqrt(count)/sigma,
+    with the noise sigma estimated from the whole data by the median absolute deviation of the successive differences.
+    Points at x <= 0 go to the first bin and empty bins are dropped.
+    """
+    x_data = np.asarray(x_data, dtype=np.float64)
+    y_data = np.asarray(y_data, dtype=np.float64)
+
+    positive = x_data[x_data > 0]
+    if not positive.size:
+        raise ValueError(f"log_decimate bins x on a log scale and needs some x > 0, the largest x is {x_data.max() if x_data.size else None}.")
+
+    edges = np.geomspace(positive.min(), positive.max(), bins + 1)
+    index = np.clip(np.searchsorted(edges, x_data, side='right') - 1, 0, bins - 1)
+
+    count = np.bincount(index, minlength=bins)
+    filled = count > 0
+    x_reduced = np.bincount(index, weights=x_data, minlength=bins)[filled]/count[filled]
+    y_reduced = np.bincount(index, weights=y_data, minlength=bins)[filled]/count[filled]
+
+    differences = np.diff(y_data)
+    sigma = 1.4826*np.median(np.abs(differences - np.median(differences)))/np.sqrt(2)
+    weights = np.sqrt(count[filled])/(sigma if sigma > 0 else 1)
+
+    return x_reduced, y_reduced, weights
+
+def fit_data(model_func: callable, params_to_fit: dict[str, dict[float, bool]], x_data: np.ndarray, y_data: np.ndarray, xname: str, jacobian: callable = None, fit_kws: dict = None, weights: np.ndarray = None):
+    """
+    The fit itself, without loading, printing or plotting. fit_kws are passed on to the leastsq backend.
+    """
     mod = lmfit.Model(model_func, independent_vars=[xname])
     params = mod.make_params()
 
     for name, settings in params_to_fit.items():
         params[name].set(**settings)
 
-    res = mod.fit(y_data, params, **{xname: x_data})
+    fit_kws = dict(fit_kws or {})
+    if jacobian is not None:
+        fit_kws.update({"Dfun": make_dfun(jacobian, xname), "col_deriv": True})
+
+    return mod.fit(y_data, params, weights=weights, fit_kws=fit_kws, **{xname: x_data})
+
+def plot_title(path_to_data: str) -> str:
+    return re.sub(r'\.(dat|csv)$', '', os.path.basename(path_to_data))
+
+class PlotWriter():
+    """
+    Renders fit plots to PNG files in plot_dir from a background thread. It draws on a bare Agg Figure,
+    without pyplot and its global state, so it works on machines without a display and the fits never wait on it.
+    """
+
+    def __init__(self, plot_dir: str) -> None:
+        self.plot_dir = plot_dir
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+        os.makedirs(plot_dir, exist_ok=True)
+
+    def submit(self, path_to_data: str, xname: str, yname: str = 'y_label', model_func: callable = None, values: dict[str, float] = None, data: tuple[np.ndarray, np.ndarray] = None) -> None:
+        """
+        Queues the plot of the data in path_to_data, with the curve of model_func at values when both are given.
+        data, when given, is the (x, y) actually fitted, e.g. the decimated data, and is plotted instead of the file.
+        """
+        self.pending.append(self.executor.submit(self.render, path_to_data, xname, yname, model_func, values, data))
+
+    def render(self, path_to_data: str, xname: str, yname: str, model_func: callable, values: dict[str, float], data: tuple[np.ndarray, np.ndarray] = None) -> str | None:
+
+        if data is None:
+            # a failed fit may come from a file that can not even be read, there is nothing to plot then
+            try:
+                data = load_data(path_to_data)
+            except Exception:
+                return None
+            data = (data[:,0], data[:,1])
+
+        x_data, y_data = data
+
+        fig = Figure()
+        ax = fig.add_subplot()
+        ax.scatter(x_data, y_data)
+        if model_func is not None and values is not None:
+            ax.plot(x_data, model_func(**{xname: x_data}, **values), color='red', label='fitted curve')
+            ax.legend()
+        ax.set_xlabel(xname + '-coordinate')
+        ax.set_ylabel(yname)
+        ax.set_title(plot_title(path_to_data))
+
+        output = os.path.join(self.plot_dir, plot_title(path_to_data) + '.png')
+        fig.savefig(output)
+        return output
+
+    def close(self) -> list[str]:
+        """
+        Waits for the queued plots and returns the files written.
+        """
+        self.executor.shutdown(wait=True)
+        return [future.result() for future in self.pending if future.result() is not None]
+
+def summarize(res) -> dict:
+    """
+    The JSON-serializable part of a ModelResult that is worth keeping: parameters, best values and fit statistics.
+    """
+    return {
+        "params": {name: {"value": par.value, "stderr": par.stderr, "vary": par.vary} for name, par in res.params.items()},
+        "best_values": dict(res.best_values),
+        "var_names": list(res.var_names),
+        "success": bool(res.success),
+        "message": res.message,
+        "nfev": res.nfev,
+        "ndata": res.ndata,
+        "chisqr": res.chisqr,
+        "redchi": res.redchi,
+        "aic": res.aic,
+        "bic": res.bic,
+    }
+
+class CachedResult():
+    """
+    A summary kept by FitCache with the attributes of the ModelResult it came from: params as lmfit Parameters
+    with their stderr, best_values, var_names and the fit statistics, so a cache hit is used like a fresh fit.
+    """
+
+    def __init__(self, summary: dict) -> None:
+        for name, value in summary.items():
+            if name != "params":
+                setattr(self, name, value)
+
+        self.params = lmfit.Parameters()
+        for name, par in summary["params"].items():
+            self.params.add(name, value=par["value"], vary=par["vary"])
+            self.params[name].stderr = par["stderr"]
+
+        self.errorbars = all(self.params[name].stderr is not None for name in self.var_names)
+
+@lru_cache(maxsize=1024)
+def file_digest(path_to_data: str, size: int, mtime_ns: int) -> str:
+    """
+    SHA-256 of the file content, memoized by size and modification time so an unchanged file is read only once per process.
+    """
+    digest = hashlib.sha256()
+    with open(path_to_data, 'rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def model_identity(func: callable) -> str:
+    """
+    Source code of a model function, or of the class and the state of a model object like ShenModel,
+    so editing the model changes the cache key.
+    """
+    if func is None:
+        return ""
+
+    target = func if inspect.isfunction(func) else type(func)
+    try:
+        source = inspect.getsource(target)
+    except (OSError, TypeError):
+        source = target.__qualname__
+
+    state = "" if inspect.isfunction(func) else repr(sorted(vars(func).items()))
+    return source + state
+
+class FitCache():
+    """
+    On-disk cache of fit summaries, one JSON file per key in cache_dir. The key hashes the content of the data file,
+    the model, the jacobian and the whole parameter spec. Reading a file refreshes its modification time and, once the
+    directory goes over max_bytes, the least recently used files are removed.
+    """
+
+    def __init__(self, cache_dir: str = '.fit-cache', max_bytes: int = 64 * 2**20) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path_to_data: str, model_func: callable, params_to_fit: dict[str, dict[float, bool]], xname: str, jacobian: callable = None, options: dict = None) -> str:
+        stat = os.stat(path_to_data)
+        spec = json.dumps({"params": params_to_fit, "xname": xname, "options": options or {}}, sort_keys=True, default=float)
+
+        digest = hashlib.sha256()
+        for part in (file_digest(os.path.abspath(path_to_data), stat.st_size, stat.st_mtime_ns), model_identity(model_func), model_identity(jacobian), spec):
+            digest.update(part.encode())
+            digest.update(b'\0')
+
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self.path(key)) as file:
+                summary = json.load(file)
+            os.utime(self.path(key))
+        except (OSError, ValueError):
+            return None
+
+        return summary
+
+    def put(self, key: str, summary: dict) -> None:
+        temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump(summary, file)
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def fitter(model_func: callable, params_to_fit: dict[str, dict[float, bool]], path_to_data: str, xname: str, yname: str = 'y_label', jacobian: callable = None, bins: int = None, plot_writer: PlotWriter = None, cache: FitCache = None, show: bool = True):
+    """
+    parameters:
+    - jacobian: optional function with the same arguments of model_func returning {param: partial derivative},
+      given to leastsq as Dfun in place of the finite differences, defaults to model_jacobian(model_func)
+    - bins: when given, the data is reduced by log_decimate to this many log-spaced bins before fitting and plotting
+    - plot_writer: when given, the plot is queued to it and written to a file instead of shown
+    - show: without a plot_writer, whether to plot with pyplot at all, False in headless runs
+    - cache: when given, a fit already done on the same data, model and parameters is not redone,
+      a CachedResult of the stored summary is returned in place of the ModelResult
+    """
+    jacobian = jacobian or model_jacobian(model_func)
+
+    # looked up before loading, a hit that is not plotted never parses the data
+    key = cache.key(path_to_data, model_func, params_to_fit, xname, jacobian, {"bins": bins}) if cache is not None else None
+    summary = cache.get(key) if cache is not None else None
+
+    if summary is None or plot_writer is not None or show:
+        data = load_data(path_to_data)
+        x_data = data[:,0]
+        y_data = data[:,1]
+        weights = None
+
+        if bins is not None:
+            x_data, y_data, weights = log_decimate(x_data, y_data, bins)
+
+    if summary is not None:
+        print(f"cached fit of {path_to_data}")
+        res = CachedResult(summary)
+    else:
+        start = perf_counter()
+        res = fit_data(model_func, params_to_fit, x_data, y_data, xname, jacobian, weights=weights)
+        elapsed = perf_counter() - start
+        print(f"{res.nfev} model evaluations in {elapsed:.3f} s, {res.nfev/elapsed:.0f} evaluations/s")
+
+        if cache is not None:
+            cache.put(key, summarize(res))
+
     for name, settings in params_to_fit.items():
         if settings['vary']:
             val = res.params[name].value
             err = res.params[name].stderr
             print(f"{name} = {val:.2e} ± {err:.2e}")
 
+    if plot_writer is not None:
+        plot_writer.submit(path_to_data, xname, yname, model_func, res.best_values, (x_data, y_data))
+        return res
+
+    if not show:
+        return res
+
     plt.scatter(x_data, y_data)
-    plt.plot(x_data, res.best_fit, color='red', label='fitted curve')
+    plt.plot(x_data, model_func(**{xname: x_data}, **res.best_values), color='red', label='fitted curve')
     plt.legend()
     plt.xlabel(xname + '-coordinate')
     plt.ylabel(yname)
-    plt.title(re.sub(r'\.(dat|csv)$', '', os.path.basename(path_to_data)))
+    plt.title(plot_title(path_to_data))
     plt.show()
+    plt.close()
 
     return res
 
-def thermal_lens_test():
+def fit_file(task: tuple) -> dict:
+    """
+    parameters:
+    - task: (path_to_data, model_func, params_to_fit, xname, jacobian, cache), cache a FitCache or None
 
-    params = {
-        "tc": {"value": tc_def(53.5*10**-6, 0.598/(997048*4.18)), "vary": True},
-        "m": {"value": 37.29, "vary": False},
-        "V": {"value": 5.82, "vary": False},
-        "th": {"value": 0.09, "vary": True}
-    }
+    returns one row of the results table, a failed fit is recorded in the "error" column instead of raising
+    """
+    path_to_data, model_func, params_to_fit, xname, jacobian, cache = task
+    row = {"file": path_to_data}
+
+    try:
+        # the same options as fitter without bins, so batch and interactive fits of a file share the entry
+        key = cache.key(path_to_data, model_func, params_to_fit, xname, jacobian, {"bins": None}) if cache is not None else None
+        summary = cache.get(key) if cache is not None else None
+        if summary is None:
+            data = load_data(path_to_data)
+            summary = summarize(fit_data(model_func, params_to_fit, data[:,0], data[:,1], xname, jacobian))
+            if cache is not None:
+                cache.put(key, summary)
+    except Exception as error:
+        row.update({"success": False, "error": repr(error)})
+        return row
+
+    row.update({"success": summary["success"], "error": "", "nfev": summary["nfev"], "chisqr": summary["chisqr"], "redchi": summary["redchi"]})
+    for name, settings in params_to_fit.items():
+        if settings['vary']:
+            row[name] = summary["params"][name]["value"]
+            row[name + "_stderr"] = summary["params"][name]["stderr"]
+
+    return row
+
+def write_results(rows: list[dict], params_to_fit: dict[str, dict[float, bool]], output: str) -> None:
+    """
+    Writes the results table as CSV, or as Parquet when output ends with .parquet (needs pandas).
+    """
+    columns = ["file", "success", "error", "nfev", "chisqr", "redchi"]
+    for name, settings in params_to_fit.items():
+        if settings['vary']:
+            columns += [name, name + "_stderr"]
+
+    if output.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame(rows, columns=columns).to_parquet(output)
+        return
+
+    with open(output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+
+# fits with a reduced chi-square above this many times the batch median are plotted as outliers
+OUTLIER_FACTOR = 5
+
+def fit_many(glob_pattern: str, model_func: callable = thermal_lens_light_intensity_shen_model_def, params_to_fit: dict[str, dict[float, bool]] = None, xname: str = 't', jacobian: callable = None, workers: int = None, output: str = None, plot_dir: str = None, cache: FitCache = None) -> list[dict]:
+    """
+    parameters:
+    - glob_pattern: files to fit, e.g. "data/*.dat"
+    - params_to_fit: defaults to THERMAL_LENS_PARAMS
+    - workers: processes of the pool, defaults to os.cpu_count()
+    - output: optional path of the results table, .csv or .parquet
+    - jacobian: defaults to model_jacobian(model_func)
+    - plot_dir: when given, the failed fits, as soon as they come back, and the outliers, once the batch is done,
+      are plotted to this directory by a PlotWriter
+    - cache: when given, files already fitted with the same model and parameters are read from it instead of refitted
+
+    Fits every file headlessly across a process pool and returns the rows of the results table, in the order of the files.
+    """
+    params_to_fit = params_to_fit or THERMAL_LENS_PARAMS
+    jacobian = jacobian or model_jacobian(model_func)
+    paths = sorted(glob.glob(glob_pattern))
+    tasks = [(path, model_func, params_to_fit, xname, jacobian, cache) for path in paths]
+    plot_writer = PlotWriter(plot_dir) if plot_dir is not None else None
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for row in executor.map(fit_file, tasks):
+            rows.append(row)
+            if plot_writer is not None and not row["success"]:
+                plot_writer.submit(row["file"], xname)
+
+    failed = sum(not row["success"] for row in rows)
+    print(f"{len(rows)} files fitted, {failed} failed")
+
+    if plot_writer is not None:
+        redchis = [row["redchi"] for row in rows if row["success"]]
+        threshold = OUTLIER_FACTOR*np.median(redchis) if redchis else np.inf
+        for row in rows:
+            if row["success"] and row["redchi"] > threshold:
+                values = {name: row.get(name, settings['value']) for name, settings in params_to_fit.items()}
+                plot_writer.submit(row["file"], xname, model_func=model_func, values=values)
+
+        print(f"{len(plot_writer.close())} plots written to {plot_dir}")
+
+    if output is not None:
+        write_results(rows, params_to_fit, output)
+
+    return rows
+
+# a warm started fit whose reduced chi-square grows more than this over the previous one is taken as diverged
+DIVERGENCE_FACTOR = 10
+
+def warm_seeds(previous, params_to_fit: dict[str, dict[float, bool]]) -> dict[str, dict[float, bool]]:
+    """
+    params_to_fit with the values of the varying parameters replaced by the previous best fit.
+    """
+    return {name: {**settings, "value": previous.params[name].value} if settings['vary'] else settings for name, settings in params_to_fit.items()}
+
+def warm_step_scales(previous) -> np.ndarray | None:
+    """
+    leastsq diag: 1/stderr of each varying parameter, so the trust region is measured in standard errors of the previous fit.
+    """
+    stderrs = [previous.params[name].stderr for name in previous.var_names]
+    if not all(stderrs):
+        return None
+
+    return 1/np.array(stderrs)
+
+def diverged(res, previous) -> bool:
+    values = [res.params[name].value for name in res.var_names]
+    if not res.success or not res.errorbars or not np.all(np.isfinite(values)):
+        return True
+
+    return previous is not None and res.redchi > DIVERGENCE_FACTOR*previous.redchi
+
+def fit_sequence(paths: list[str], model_func: callable = thermal_lens_light_intensity_shen_model_def, params_to_fit: dict[str, dict[float, bool]] = None, xname: str = 't', jacobian: callable = None, warm: bool = True) -> list:
+    """
+    parameters:
+    - paths: transients of the same sample, in acquisition order
+    - params_to_fit: default seeds, THERMAL_LENS_PARAMS if not given
+    - jacobian: defaults to model_jacobian(model_func)
+    - warm: seed every fit with the previous result, when False each file starts from the default seeds
+
+    A warm started fit that diverges is redone from the default seeds, and the chain goes on from that one.
+    """
+    params_to_fit = params_to_fit or THERMAL_LENS_PARAMS
+    jacobian = jacobian or model_jacobian(model_func)
+    results = []
+    previous = None
+
+    for path in paths:
+        data = load_data(path)
+        x_data = data[:,0]
+        y_data = data[:,1]
+
+        if warm and previous is not None:
+            scales = warm_step_scales(previous)
+            res = fit_data(model_func, warm_seeds(previous, params_to_fit), x_data, y_data, xname, jacobian, {"diag": scales} if scales is not None else None)
+            if diverged(res, previous):
+                res = fit_data(model_func, params_to_fit, x_data, y_data, xname, jacobian)
+        else:
+            res = fit_data(model_func, params_to_fit, x_data, y_data, xname, jacobian)
+
+        results.append(res)
+        previous = res if not diverged(res, None) else None
+
+    return results
+
+# eigenvalues of the shared Schur complement, with J^T J scaled to a unit diagonal, below this are taken as undetermined
+SINGULAR_TOLERANCE = 1e-10
+
+def block_arrow_variances(hessian, shared: int, blocks: int) -> np.ndarray:
+    """
+    parameters:
+    - hessian: sparse J^T J, the first shared columns for the shared parameters, then blocks equal diagonal blocks,
+      one per dataset, coupled only to the shared columns
+    - shared, blocks: number of shared columns and of datasets
+
+    returns the parameter variances, up to the redchi factor, in O(blocks): with J^T J scaled to a unit diagonal,
+    every dataset block D_i is inverted on its own and the shared block through its Schur complement
+    S = A - sum B_i D_i^-1 B_i^T, then var(shared) = diag(S^-1) and var(block i) = diag(D_i^-1 + D_i^-1 B_i^T S^-1 B_i D_i^-1).
+    S is pseudo-inverted: a combination of the shared parameters the data does not determine, like the one of m and V
+    that the Shen model trades against the tc of every dataset, is held fixed and adds nothing to the variances.
+    """
+    diagonal = hessian.diagonal()
+    scale = np.where(diagonal > 0, 1/np.sqrt(np.where(diagonal > 0, diagonal, 1)), 0)
+    hessian = (diags(scale) @ hessian @ diags(scale)).tocsr()
+    local = (hessian.shape[0] - shared)//blocks if blocks else 0
+
+    A = hessian[:shared, :shared].toarray()
+    B = hessian[:shared, shared:].toarray().reshape(shared, blocks, local)
+    tail = hessian[shared:, shared:]
+    D = np.empty((blocks, local, local))
+    for a in range(local):
+        for b in range(local):
+            D[:, a, b] = tail.diagonal(b - a)[min(a, b)::local][:blocks]
+
+    Dinv = np.linalg.pinv(D) if local else D
+    BDinv = np.einsum('kip,ipq->kiq', B, Dinv)
+
+    eigenvalues, eigenvectors = np.linalg.eigh(A - np.einsum('kiq,liq->kl', BDinv, B))
+    determined = eigenvalues > SINGULAR_TOLERANCE
+    Sinv = (eigenvectors[:, determined]/eigenvalues[determined]) @ eigenvectors[:, determined].T
+
+    local_variances = np.diagonal(Dinv, axis1=1, axis2=2) + np.einsum('kiq,kl,liq->iq', BDinv, Sinv, BDinv)
+    return np.concatenate([np.diag(Sinv), local_variances.ravel()])*scale**2
+
+def global_fit(paths: list[str], model_func: callable = thermal_lens_light_intensity_shen_model_def, params_to_fit: dict[str, dict[float, bool]] = None, shared: tuple[str, ...] = ("m", "V"), xname: str = 't'):
+    """
+    parameters:
+    - paths: transients taken with the same optical setup
+    - params_to_fit: seeds, THERMAL_LENS_PARAMS with every parameter varying if not given
+    - shared: parameters common to every dataset, the others get one copy per dataset named like tc_0, tc_1, ...
+
+    returns the fitted parameters, with their stderr, and the scipy least_squares result
+
+    One least-squares fit of the stacked residuals of all the datasets. The model is evaluated once over the
+    concatenated data, with every per-dataset parameter broadcast to the points it owns, and the Jacobian is
+    declared sparse (a dataset only depends on the shared parameters and on its own), so the cost grows linearly
+    with the number of datasets.
+    """
+    params_to_fit = params_to_fit or {name: {**settings, "vary": True} for name, settings in THERMAL_LENS_PARAMS.items()}
+    datasets = [load_data(path) for path in paths]
+    x_data = np.concatenate([data[:,0] for data in datasets])
+    y_data = np.concatenate([data[:,1] for data in datasets])
+    owner = np.repeat(np.arange(len(datasets)), [len(data) for data in datasets])
+
+    params = lmfit.Parameters()
+    for name, settings in params_to_fit.items():
+        if name in shared:
+            params.add(name, **settings)
+    for i in range(len(datasets)):
+        for name, settings in params_to_fit.items():
+            if name not in shared:
+                params.add(f"{name}_{i}", **settings)
+
+    varying = [name for name, par in params.items() if par.vary]
+
+    def residual(x: np.ndarray) -> np.ndarray:
+        values = params.valuesdict()
+        values.update(zip(varying, x))
+        arguments = {name: values[name] if name in shared else np.array([values[f"{name}_{i}"] for i in range(len(datasets))])[owner] for name in params_to_fit}
+        return y_data - model_func(**{xname: x_data}, **arguments)
+
+    offsets = np.concatenate([[0], np.cumsum([len(data) for data in datasets])])
+    rows, columns = [], []
+    for column, name in enumerate(varying):
+        if name in shared:
+            dependent = np.arange(len(y_data))
+        else:
+            i = int(name.rsplit('_', 1)[1])
+            dependent = np.arange(offsets[i], offsets[i+1])
+        rows.append(dependent)
+        columns.append(np.full(len(dependent), column))
+    rows, columns = np.concatenate(rows), np.concatenate(columns)
+    sparsity = coo_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(y_data), len(varying))).tocsr()
+
+    # called directly, lmfit's least_squares wrapper can not build the covariance from a sparse Jacobian
+    ret = least_squares(residual, [params[name].value for name in varying], jac_sparsity=sparsity, tr_solver='lsmr', x_scale='jac')
+
+    # pseudo-inverses since m and V are close to degenerate, a variance that comes out non-positive is reported as None like lmfit does
+    redchi = 2*ret.cost/max(len(y_data) - len(varying), 1)
+    variances = block_arrow_variances(ret.jac.T @ ret.jac, sum(name in shared for name in varying), len(datasets))*redchi
+    stderrs = [float(np.sqrt(variance)) if variance > 0 and np.isfinite(variance) else None for variance in variances]
+
+    for name, value, stderr in zip(varying, ret.x, stderrs):
+        params[name].set(value=value)
+        params[name].stderr = stderr
+
+    return params, ret
+
+# model values computed per pass of grid_chisqr, 32 MiB of float64, so the scan memory does not grow with the data
+GRID_CHUNK_SIZE = 2**22
+
+def grid_chisqr(model_func: callable, params_to_fit: dict[str, dict[float, bool]], grid: dict[str, np.ndarray], x_data: np.ndarray, y_data: np.ndarray, xname: str) -> np.ndarray:
+    """
+    Chi-square of the model at every point of the grid, one array per grid parameter and one axis per parameter,
+    the other parameters stay at their values in params_to_fit. The grid points are evaluated in broadcasted passes
+    of at most GRID_CHUNK_SIZE model values.
+    """
+    mesh = np.meshgrid(*[np.asarray(values, dtype=np.float64) for values in grid.values()], indexing='ij')
+    points = [axis.ravel() for axis in mesh]
+    chisqr = np.empty(points[0].size)
+    step = max(1, GRID_CHUNK_SIZE // max(len(x_data), 1))
+
+    arguments = {name: settings['value'] for name, settings in params_to_fit.items()}
+    for first in range(0, chisqr.size, step):
+        for name, values in zip(grid, points):
+            arguments[name] = values[first:first + step, np.newaxis]
+
+        with np.errstate(all='ignore'):
+            chisqr[first:first + step] = np.sum((y_data - model_func(**{xname: x_data}, **arguments))**2, axis=-1)
+
+    return np.where(np.isfinite(chisqr), chisqr, np.inf).reshape(mesh[0].shape)
+
+def refine_seed(task: tuple) -> tuple[float, dict[str, dict[float, bool]]]:
+    """
+    parameters:
+    - task: (model_func, seeds, x_data, y_data, xname, jacobian)
+
+    returns the chi-square of the fit started from seeds and the seeds updated with its best values
+    """
+    model_func, seeds, x_data, y_data, xname, jacobian = task
+    try:
+        res = fit_data(model_func, seeds, x_data, y_data, xname, jacobian)
+    except Exception:
+        return np.inf, seeds
+
+    if not np.isfinite(res.chisqr):
+        return np.inf, seeds
+
+    return res.chisqr, {name: {**settings, "value": res.params[name].value} for name, settings in seeds.items()}
+
+def multi_start_fit(path_to_data: str, model_func: callable = thermal_lens_light_intensity_shen_model_def, params_to_fit: dict[str, dict[float, bool]] = None, xname: str = 't', jacobian: callable = None, grid: dict[str, np.ndarray] = None, starts: int = 4, workers: int = None):
+    """
+    parameters:
+    - params_to_fit: THERMAL_LENS_PARAMS if not given
+    - jacobian: defaults to model_jacobian(model_func)
+    - grid: coarse values of the parameters to scan, by default tc over three decades around its seed and th in [-1, 1]
+    - starts: how many of the best grid points are refined by a full fit
+    - workers: processes refining the starts in parallel, defaults to os.cpu_count()
+
+    returns the ModelResult of the refinement with the lowest chi-square
+    """
+    params_to_fit = params_to_fit or THERMAL_LENS_PARAMS
+    jacobian = jacobian or model_jacobian(model_func)
+    if grid is None:
+        tc = params_to_fit["tc"]["value"]
+        grid = {"tc": np.geomspace(tc/30, tc*30, 31), "th": np.linspace(-1, 1, 81)}
+
+    data = load_data(path_to_data)
+    x_data = np.asarray(data[:,0])
+    y_data = np.asarray(data[:,1])
+
+    chisqr = grid_chisqr(model_func, params_to_fit, grid, x_data, y_data, xname)
+    best = np.argsort(chisqr, axis=None)[:starts]
+
+    tasks = []
+    for flat in best:
+        point = np.unravel_index(flat, chisqr.shape)
+        seeds = {name: dict(settings) for name, settings in params_to_fit.items()}
+        for (name, values), i in zip(grid.items(), point):
+            seeds[name]["value"] = float(values[i])
+        tasks.append((model_func, seeds, x_data, y_data, xname, jacobian))
+
+    if workers == 1:
+        refined = list(map(refine_seed, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            refined = list(executor.map(refine_seed, tasks))
+
+    # the winner is fitted once more here, from its own optimum, to hand back a full ModelResult
+    _, seeds = min(refined, key=lambda item: item[0])
+    return fit_data(model_func, seeds, x_data, y_data, xname, jacobian)
+
+def bootstrap_chunk(task: tuple) -> np.ndarray:
+    """
+    parameters:
+    - task: (model, t, fitted, residuals, start, seed, count), model a ShenModel, start the best (tc, th)
+
+    returns count bootstrap estimates of (tc, th), refitting fitted + resampled residuals with leastsq and the
+    analytic Jacobian directly, no lmfit on this path. Failed replicates are nan.
+    """
+    model, t, fitted, residuals, start, seed, count = task
+    rng = np.random.default_rng(seed)
+    estimates = np.full((count, 2), np.nan)
+
+    def jacobian(p: np.ndarray, y: np.ndarray) -> np.ndarray:
+        partials = model.jacobian(t, *p)
+        return -np.array([partials["tc"], partials["th"]])
+
+    for i in range(count):
+        y = fitted + rng.choice(residuals, len(residuals))
+        p, ier = leastsq(lambda p, y: y - model(t, *p), start, args=(y,), Dfun=jacobian, col_deriv=True)
+        if ier in (1, 2, 3, 4):
+            estimates[i] = p
+
+    return estimates
+
+def bootstrap_fit(path_to_data: str, replicates: int = 1000, params_to_fit: dict[str, dict[float, bool]] = None, confidence: float = 0.95, workers: int = None, seed: int = 0) -> dict[str, tuple[float, float, float]]:
+    """
+    parameters:
+    - replicates: number of bootstrap refits
+    - params_to_fit: THERMAL_LENS_PARAMS if not given
+    - confidence: coverage of the percentile intervals
+    - workers: processes sharing the replicates, defaults to os.cpu_count()
+
+    returns {name: (best value, lower, upper)} for tc and th, lower and upper None when no replicate converged
+
+    Residual bootstrap: the best fit is done once, then its residuals are resampled onto its curve and refitted.
+    Every replicate starts from the best (tc, th) and the geometry (m, V) of the best fit is held fixed in a ShenModel,
+    even when params_to_fit lets m or V vary: the intervals are those of tc and th at the fitted geometry,
+    without the uncertainty of m and V.
+    """
+    params_to_fit = params_to_fit or THERMAL_LENS_PARAMS
+    data = load_data(path_to_data)
+    t = np.asarray(data[:,0])
+    y_data = np.asarray(data[:,1])
+
+    best = fit_data(thermal_lens_light_intensity_shen_model_def, params_to_fit, t, y_data, 't', thermal_lens_light_intensity_shen_model_jacobian)
+    model = ShenModel.from_geometry(best.params["m"].value, best.params["V"].value)
+    start = np.array([best.params["tc"].value, best.params["th"].value])
+    fitted = model(t, *start)
+    residuals = y_data - fitted
+
+    workers = workers or os.cpu_count() or 1
+    chunks = np.array_split(np.arange(replicates), workers)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(model, t, fitted, residuals, start, chunk_seed, len(chunk)) for chunk, chunk_seed in zip(chunks, seeds)]
+
+    if workers == 1:
+        estimates = np.concatenate(list(map(bootstrap_chunk, tasks)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            estimates = np.concatenate(list(executor.map(bootstrap_chunk, tasks)))
+
+    estimates = estimates[np.all(np.isfinite(estimates), axis=1)]
+    tail = 100*(1 - confidence)/2
+
+    intervals = {}
+    print(f"{len(estimates)} of {replicates} bootstrap replicates converged, {100*confidence:.0f}% percentile intervals:")
+    varying_geometry = [name for name in ("m", "V") if params_to_fit[name]['vary']]
+    if varying_geometry:
+        held = ' and '.join(varying_geometry)
+        print(f"{held} held at the best fit in the replicates, the intervals do not include the uncertainty of {held}")
+
+    for i, name in enumerate(("tc", "th")):
+        stderr = "None" if best.params[name].stderr is None else f"{best.params[name].stderr:.1e}"
+        if not len(estimates):
+            intervals[name] = (start[i], None, None)
+            print(f"{name} = {start[i]:.4e} [None, None], covariance stderr {stderr}")
+            continue
+
+        lower, upper = np.percentile(estimates[:,i], [tail, 100 - tail])
+        intervals[name] = (start[i], lower, upper)
+        print(f"{name} = {start[i]:.4e} [{lower:.4e}, {upper:.4e}], covariance stderr {stderr}, bootstrap std {estimates[:,i].std():.1e}")
+
+    return intervals
+
+class StreamingFitter():
+    """
+    Fits a transient while it is acquired. Chunks of (x, y) rows are fed as they come and the model is refitted
+    at geometric checkpoints of the number of points (first, first*growth, ...), warm started from the previous
+    estimate as in fit_sequence. The rows are not kept: they are reduced on arrival to running sums over log-spaced
+    bins, bins_per_decade per decade of x from the first positive x, the reduction and weights of log_decimate.
+    A chunk costs its own rows plus, at a checkpoint, at most two fits over the filled bins, the warm one and a cold
+    one when the warm one is not determined, so the latency per chunk grows only with the decades of x covered,
+    not with the number of rows.
+    """
+
+    def __init__(self, model_func: callable = thermal_lens_light_intensity_shen_model_def, params_to_fit: dict[str, dict[float, bool]] = None, xname: str = 't', jacobian: callable = None, first: int = 64, growth: float = 2.0, bins_per_decade: int = 40) -> None:
+        self.model_func = model_func
+        self.params_to_fit = params_to_fit or THERMAL_LENS_PARAMS
+        self.xname = xname
+        self.jacobian = jacobian or model_jacobian(model_func)
+        self.growth = growth
+        self.checkpoint = first
+        self.log_step = np.log(10)/bins_per_decade
+        self.origin = None
+        self.counts = np.zeros(0)
+        self.x_sums = np.zeros(0)
+        self.y_sums = np.zeros(0)
+        self.sigmas = []
+        self.last_x = None
+        self.count = 0
+        self.fitted = 0
+        self.estimate = None
+        self.result = None
+
+    @staticmethod
+    def determined(res) -> bool:
+        """
+        Whether res converged with every varying parameter known better than its own magnitude.
+        """
+        if diverged(res, None):
+            return False
+
+        return all(abs(res.params[name].stderr) < abs(res.params[name].value) for name in res.var_names)
+
+    def accumulate(self, x_data: np.ndarray, y_data: np.ndarray) -> None:
+        """
+        Adds the rows to the bin sums. Rows before the first positive x, or at x <= 0, go to the first bin as in log_decimate.
+        """
+        if self.origin is None and np.any(x_data > 0):
+            self.origin = x_data[x_data > 0].min()
+
+        index = np.zeros(len(x_data), dtype=np.int64)
+        if self.origin is not None:
+            positive = x_data > 0
+            index[positive] = np.maximum(np.floor(np.log(x_data[positive]/self.origin)/self.log_step), 0)
+
+        size = max(len(self.counts), int(index.max()) + 1)
+        self.counts = np.bincount(index, minlength=size) + np.pad(self.counts, (0, size - len(self.counts)))
+        self.x_sums = np.bincount(index, weights=x_data, minlength=size) + np.pad(self.x_sums, (0, size - len(self.x_sums)))
+        self.y_sums = np.bincount(index, weights=y_data, minlength=size) + np.pad(self.y_sums, (0, size - len(self.y_sums)))
+
+        # the noise estimate of log_decimate, per chunk, the median over the chunks is used
+        if len(y_data) > 2:
+            differences = np.diff(y_data)
+            self.sigmas.append(1.4826*np.median(np.abs(differences - np.median(differences)))/np.sqrt(2))
+
+        self.last_x = float(x_data[-1])
+
+    def refit(self) -> dict | None:
+        filled = self.counts > 0
+        if np.count_nonzero(filled) <= sum(settings['vary'] for settings in self.params_to_fit.values()):
+            return None
+
+        x_data = self.x_sums[filled]/self.counts[filled]
+        y_data = self.y_sums[filled]/self.counts[filled]
+        sigma = np.median(self.sigmas) if self.sigmas else 0
+        weights = np.sqrt(self.counts[filled])/(sigma if sigma > 0 else 1)
+
+        seeds, fit_kws = self.params_to_fit, None
+        if self.result is not None:
+            seeds = warm_seeds(self.result, self.params_to_fit)
+            scales = warm_step_scales(self.result)
+            fit_kws = {"diag": scales} if scales is not None else None
+
+        res = fit_data(self.model_func, seeds, x_data, y_data, self.xname, self.jacobian, fit_kws, weights)
+        if self.result is not None and not self.determined(res):
+            cold = fit_data(self.model_func, self.params_to_fit, x_data, y_data, self.xname, self.jacobian, weights=weights)
+            res = min(res, cold, key=lambda candidate: candidate.chisqr if np.isfinite(candidate.chisqr) else np.inf)
+
+        # early on, with only t << tc acquired, tc and th are degenerate and the fit can wander off,
+        # such a result is reported but not used to seed the next refit
+        if self.determined(res):
+            self.result = res
+
+        self.fitted = self.count
+        estimate = {"points": self.count, self.xname: self.last_x}
+        for name in res.var_names:
+            estimate[name] = res.params[name].value
+            estimate[name + "_stderr"] = res.params[name].stderr
+        return estimate
+
+    def timed_refit(self) -> dict | None:
+
+        start = perf_counter()
+        estimate = self.refit()
+        if estimate is not None:
+            estimate["latency"] = perf_counter() - start
+            self.estimate = estimate
+
+        return estimate
+
+    def feed(self, chunk: np.ndarray) -> dict | None:
+        """
+        Adds the rows of chunk and returns a new estimate when a checkpoint was crossed, None otherwise.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(-1, 2)
+        if not len(chunk):
+            return None
+
+        self.accumulate(chunk[:,0], chunk[:,1])
+        self.count += len(chunk)
+        if self.count < self.checkpoint:
+            return None
+
+        estimate = self.timed_refit()
+        if estimate is None:
+            return None
+
+        while self.checkpoint <= self.count:
+            self.checkpoint = int(np.ceil(self.checkpoint*self.growth))
+
+        return estimate
+
+    def finish(self) -> dict | None:
+        """
+        Final estimate over all the rows fed, the last one when nothing came since it.
+        """
+        if self.count == self.fitted:
+            return self.estimate
+
+        return self.timed_refit()
+
+    def stream(self, chunks: Iterable[np.ndarray]) -> Iterator[dict]:
+        for chunk in chunks:
+            estimate = self.feed(chunk)
+            if estimate is not None:
+                yield estimate
+
+        if self.count > self.fitted:
+            estimate = self.finish()
+            if estimate is not None:
+                yield estimate
+
+def parse_rows(lines: bytes) -> np.ndarray:
+    """
+    The first two columns of text rows, parsed like load_data parses a file, comments and extra columns included.
+    """
+    with warnings.catch_warnings():
+        # a chunk of only comments or blank lines is not an error here, just no rows
+        warnings.simplefilter('ignore', UserWarning)
+        rows = np.loadtxt(io.BytesIO(lines), ndmin=2)
+
+    return rows[:, :2] if rows.size else np.empty((0, 2))
+
+def follow_file(path_to_data: str, poll: float = 0.1, idle: float = 5.0) -> Iterator[np.ndarray]:
+    """
+    Yields the complete rows appended to a file that is still being written, until nothing new comes for idle seconds.
+    A last row without its newline is yielded then.
+    """
+    pending = b''
+    waited = 0.0
+    with open(path_to_data, 'rb') as file:
+        while waited < idle:
+            pending += file.read()
+            end = pending.rfind(b'\n') + 1
+            if not end:
+                sleep(poll)
+                waited += poll
+                continue
+
+            lines, pending = pending[:end], pending[end:]
+            waited = 0.0
+            yield parse_rows(lines)
+
+    if pending.strip():
+        yield parse_rows(pending)
+
+def replay_file(path_to_data: str, rows: int = 256, interval: float = 0.0) -> Iterator[np.ndarray]:
+    """
+    Replays an existing transient as chunks of rows, waiting interval seconds between them like an acquisition would.
+    """
+    data = load_data(path_to_data)
+    for first in range(0, len(data), rows):
+        if interval:
+            sleep(interval)
+        yield np.asarray(data[first:first + rows])
+
+def streaming_replay(datapath: str = r"dummy-thermal_lens-transient.dat", rows: int = 256, follow: bool = False):
+    """
+    Prints the StreamingFitter estimates of datapath, replayed in chunks of rows, or followed while it is written when follow.
+    """
+    chunks = follow_file(datapath) if follow else replay_file(datapath, rows)
+    for estimate in StreamingFitter().stream(chunks):
+        print(f"{estimate['points']} points up to t = {estimate['t']:.3e}: tc = {estimate['tc']:.4e} ± {estimate['tc_stderr']:.1e}, th = {estimate['th']:.4e} ± {estimate['th_stderr']:.1e}, {1000*estimate['latency']:.1f} ms")
+
+def print_params(params: lmfit.Parameters) -> None:
+
+    for name, par in params.items():
+        if par.vary:
+            print(f"{name} = {par.value:.4e} ± " + ("None" if par.stderr is None else f"{par.stderr:.1e}"))
+
+THERMAL_LENS_PARAMS = {
+    "tc": {"value": tc_def(53.5*10**-6, 0.598/(997048*4.18)), "vary": True},
+    "m": {"value": 37.29, "vary": False},
+    "V": {"value": 5.82, "vary": False},
+    "th": {"value": 0.09, "vary": True}
+}
+
+def thermal_lens_test(plot_writer: PlotWriter = None, show: bool = True):
+
+    params = THERMAL_LENS_PARAMS
 
     datapath = r"dummy-thermal_lens-transient.dat"
 
-    fitter(thermal_lens_light_intensity_shen_model_def, params, datapath, 't', 'Normalized light intensity')
+    fitter(thermal_lens_light_intensity_shen_model_def, params, datapath, 't', 'Normalized light intensity', thermal_lens_light_intensity_shen_model_jacobian, plot_writer=plot_writer, show=show)
+
+def shen_model_benchmark(datapath: str = r"dummy-thermal_lens-transient.dat", repeats: int = 20):
 
-def beam_profile_test():
+    data = load_data(datapath)
+    x_data = data[:,0]
+    y_data = data[:,1]
+
+    tc = tc_def(53.5*10**-6, 0.598/(997048*4.18))
+    optics = {"z1": 0.0125, "z2": 1.0, "re0": 53.5*10**-6, "rp0": 42*10**-6, "lp": 632.8*10**-9}
+
+    generic = lmfit.Model(thermal_lens_light_intensity_shen_model, independent_vars=['t'])
+    generic_params = generic.make_params(tc=tc, th=0.09, **optics)
+    for name in optics:
+        generic_params[name].set(vary=False)
+
+    compiled = lmfit.Model(ShenModel(**optics), independent_vars=['t'])
+    compiled_params = compiled.make_params(tc=tc, th=0.09)
+
+    for name, mod, params in (("generic", generic, generic_params), ("compiled", compiled, compiled_params)):
+        nfev = 0
+        start = perf_counter()
+        for _ in range(repeats):
+            nfev += mod.fit(y_data, params, t=x_data).nfev
+        elapsed = perf_counter() - start
+        print(f"{name} Shen model: {nfev/elapsed:.0f} evaluations/s, {1000*elapsed/repeats:.1f} ms per fit")
+
+def jacobian_benchmark(datapath: str = r"dummy-thermal_lens-transient.dat", repeats: int = 20):
+
+    data = load_data(datapath)
+    x_data = data[:,0]
+    y_data = data[:,1]
+
+    mod = lmfit.Model(thermal_lens_light_intensity_shen_model_def, independent_vars=['t'])
+    params = mod.make_params(tc=tc_def(53.5*10**-6, 0.598/(997048*4.18)), m=37.29, V=5.82, th=0.09)
+
+    fit_kws = {"Dfun": make_dfun(thermal_lens_light_intensity_shen_model_jacobian, 't'), "col_deriv": True}
+    for name, kws in (("finite differences", None), ("analytic jacobian", fit_kws)):
+        start = perf_counter()
+        for _ in range(repeats):
+            res = mod.fit(y_data, params, t=x_data, fit_kws=kws)
+        elapsed = perf_counter() - start
+        print(f"{name}: {1000*elapsed/repeats:.1f} ms per fit, {res.nfev} evaluations, chi-square {res.chisqr:.4e}")
+
+def warm_start_benchmark(glob_pattern: str = r"*thermal_lens-transient*.dat"):
+
+    paths = sorted(glob.glob(glob_pattern))
+
+    for name, warm in (("cold", False), ("warm", True)):
+        start = perf_counter()
+        results = fit_sequence(paths, warm=warm)
+        elapsed = perf_counter() - start
+        nfev = sum(res.nfev for res in results)
+        print(f"{name} start: {nfev/len(paths):.1f} evaluations per file, {1000*elapsed/len(paths):.1f} ms per file")
+
+def load_benchmark(datapath: str = r"dummy-thermal_lens-transient.dat", repeats: int = 5):
+
+    for stale in glob.glob(glob.escape(datapath) + '.*-*.npy'):
+        os.remove(stale)
+
+    start = perf_counter()
+    load_data(datapath)
+    print(f"load_data, first run writing the sidecar: {1000*(perf_counter() - start):.2f} ms")
+
+    for name, load in (("np.loadtxt", np.loadtxt), ("load_data", load_data)):
+        start = perf_counter()
+        for _ in range(repeats):
+            data = load(datapath)
+            data[:,1].sum()
+        print(f"{name}: {1000*(perf_counter() - start)/repeats:.2f} ms per load")
+
+def decimation_report(datapath: str = r"dummy-thermal_lens-transient.dat", bins: int = 200, model_func: callable = thermal_lens_light_intensity_shen_model_def, params_to_fit: dict[str, dict[float, bool]] = None, xname: str = 't', jacobian: callable = None, repeats: int = 10):
+
+    params_to_fit = params_to_fit or THERMAL_LENS_PARAMS
+    jacobian = jacobian or model_jacobian(model_func)
+    data = load_data(datapath)
+    x_data = data[:,0]
+    y_data = data[:,1]
+
+    start = perf_counter()
+    for _ in range(repeats):
+        full = fit_data(model_func, params_to_fit, x_data, y_data, xname, jacobian)
+    full_time = (perf_counter() - start)/repeats
+
+    start = perf_counter()
+    for _ in range(repeats):
+        x_reduced, y_reduced, weights = log_decimate(x_data, y_data, bins)
+        reduced = fit_data(model_func, params_to_fit, x_reduced, y_reduced, xname, jacobian, weights=weights)
+    reduced_time = (perf_counter() - start)/repeats
+
+    print(f"{len(x_data)} points reduced to {len(x_reduced)}")
+    for name in full.var_names:
+        full_par, reduced_par = full.params[name], reduced.params[name]
+        shift = abs(reduced_par.value - full_par.value)/full_par.stderr if full_par.stderr else float('nan')
+        print(f"{name}: full {full_par.value:.4e} ± {full_par.stderr:.1e}, reduced {reduced_par.value:.4e} ± {reduced_par.stderr:.1e}, shift {shift:.2f} stderr")
+    print(f"full fit {1000*full_time:.2f} ms, reduced fit {1000*reduced_time:.2f} ms, speedup {full_time/reduced_time:.1f}x")
+
+def global_fit_benchmark(glob_pattern: str = r"*thermal_lens-transient*.dat", counts: tuple[int, ...] = (4, 16, 64)):
+
+    paths = sorted(glob.glob(glob_pattern))
+
+    for count in counts:
+        subset = [paths[i % len(paths)] for i in range(count)]
+        start = perf_counter()
+        params, ret = global_fit(subset)
+        elapsed = perf_counter() - start
+        stderrs = {name: "None" if params[name].stderr is None else f"{params[name].stderr:.1e}" for name in ("m", "V")}
+        print(f"global fit of {count} datasets: {elapsed:.2f} s, {1000*elapsed/count:.1f} ms per dataset, {ret.nfev} evaluations, m = {params['m'].value:.3f} ± {stderrs['m']}, V = {params['V'].value:.3f} ± {stderrs['V']}")
+
+def multi_start_benchmark(datapath: str = r"dummy-thermal_lens-transient.dat"):
+
+    # seeds far from the optimum, where a single fit tends to stall
+    bad_seeds = {name: dict(settings) for name, settings in THERMAL_LENS_PARAMS.items()}
+    bad_seeds["tc"]["value"] *= 20
+    bad_seeds["th"]["value"] = -0.5
+
+    data = load_data(datapath)
+    start = perf_counter()
+    single = fit_data(thermal_lens_light_intensity_shen_model_def, bad_seeds, data[:,0], data[:,1], 't', thermal_lens_light_intensity_shen_model_jacobian)
+    print(f"single start: chi-square {single.chisqr:.4e}, tc = {single.params['tc'].value:.3e}, th = {single.params['th'].value:.3e}, {perf_counter() - start:.3f} s")
+
+    start = perf_counter()
+    multi = multi_start_fit(datapath, params_to_fit=bad_seeds)
+    print(f"multi start: chi-square {multi.chisqr:.4e}, tc = {multi.params['tc'].value:.3e}, th = {multi.params['th'].value:.3e}, {perf_counter() - start:.3f} s")
+
+def fit_cache_benchmark(datapath: str = r"dummy-thermal_lens-transient.dat"):
+
+    # an empty cache every run, so the first lookup is always a miss
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FitCache(cache_dir)
+        for name in ("miss", "hit"):
+            start = perf_counter()
+            key = cache.key(datapath, thermal_lens_light_intensity_shen_model_def, THERMAL_LENS_PARAMS, 't', thermal_lens_light_intensity_shen_model_jacobian, {"bins": None})
+            summary = cache.get(key)
+            if summary is None:
+                data = load_data(datapath)
+                summary = summarize(fit_data(thermal_lens_light_intensity_shen_model_def, THERMAL_LENS_PARAMS, data[:,0], data[:,1], 't', thermal_lens_light_intensity_shen_model_jacobian))
+                cache.put(key, summary)
+            print(f"cache {name}: {1000*(perf_counter() - start):.2f} ms")
+
+def beam_profile_test(plot_writer: PlotWriter = None, show: bool = True):
 
     params = {
         "z0": {"value": 0., "vary": False},
@@ -134,12 +1327,81 @@ def beam_profile_test():
 
     datapath = r"dummy-beam-profile.dat"
 
-    fitter(gaussian_laser_beam_profile_def, params, datapath, 'z', 'Beam radius')
+    fitter(gaussian_laser_beam_profile_def, params, datapath, 'z', 'Beam radius', plot_writer=plot_writer, show=show)
+
+def get_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(__file__),
+        usage="%(prog)s [options]",
+        description="",
+        epilog=""
+    )
+
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--batch", metavar='GLOB', help='Fit every file matching GLOB with the thermal lens model, without plots')
+    group.add_argument("--global", dest='global_glob', metavar='GLOB', help='Fit the files matching GLOB together, with m and V shared by all of them')
+    group.add_argument("--stream", metavar='FILE', help='Fit FILE while it is being written, printing the estimate at every checkpoint')
+    group.add_argument("--bootstrap", metavar='FILE', help='Residual bootstrap intervals of tc and th for FILE')
+    group.add_argument("--multi-start", metavar='FILE', help='Fit FILE from the best points of a coarse grid of tc and th')
+    group.add_argument("--benchmark", action='store_true', help='Run the benchmarks on the dummy data of the working directory')
+
+    parser.add_argument("--replicates", type=int, default=1000, help='Refits done by --bootstrap. Default: 1000')
+    parser.add_argument("--workers", type=int, default=None, help='Processes used by --batch, --bootstrap and --multi-start. Default: the number of CPUs')
+    parser.add_argument("--output", type=str, default='fit-results.csv', help='Results table written by --batch, .csv or .parquet. Default: fit-results.csv')
+    parser.add_argument("--headless", action='store_true', help='Use the Agg backend, never clear the terminal nor open windows')
+    parser.add_argument("--cache", metavar='DIR', default=None, help='Keep the fit results in DIR and reuse them when the same file is fitted again')
+    parser.add_argument("--plots", metavar='DIR', default=None, help='Write the plots to DIR instead of showing them. With --batch only the failed and outlier fits are plotted')
+
+    return parser
 
 if __name__ == '__main__':
 
-    os.system('cls')
+    args = get_parser().parse_args()
+
+    if args.headless:
+        plt.switch_backend('Agg')
+
+    if args.batch:
+        cache = FitCache(args.cache) if args.cache is not None else None
+        fit_many(args.batch, workers=args.workers, output=args.output, plot_dir=args.plots, cache=cache)
+
+    elif args.global_glob:
+        params, ret = global_fit(sorted(glob.glob(args.global_glob)))
+        print(f"{ret.nfev} evaluations, chi-square {2*ret.cost:.4e}")
+        print_params(params)
+
+    elif args.stream:
+        streaming_replay(args.stream, follow=True)
+
+    elif args.bootstrap:
+        bootstrap_fit(args.bootstrap, replicates=args.replicates, workers=args.workers)
+
+    elif args.multi_start:
+        res = multi_start_fit(args.multi_start, workers=args.workers)
+        print(f"{res.nfev} evaluations, chi-square {res.chisqr:.4e}")
+        print_params(res.params)
+
+    elif args.benchmark:
+        shen_model_benchmark()
+        jacobian_benchmark()
+        warm_start_benchmark()
+        load_benchmark()
+        decimation_report()
+        global_fit_benchmark()
+        multi_start_benchmark()
+        streaming_replay()
+        fit_cache_benchmark()
+
+    else:
+        if not args.headless:
+            os.system('cls' if os.name == 'nt' else 'clear')
+
+        plot_writer = PlotWriter(args.plots) if args.plots is not None else None
+
+        thermal_lens_test(plot_writer, show=not args.headless)
+        beam_profile_test(plot_writer, show=not args.headless)
 
-    thermal_lens_test()
-    beam_profile_test()
+        if plot_writer is not None:
+            plot_writer.close()
 